@@ -29,11 +29,27 @@ _spackter_completions() {
 
   case "$compline" in
     'create'*)
-      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --configs= --prefix= --compiler= --allow-errors= --no-allow-errors= --create-mirror= --with-mirror= --spack-branch= --spack-commit=")" -- "$cur")
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --configs= --prefix= --compiler= --allow-errors= --no-allow-errors= --create-mirror= --with-mirror= --spack-branch= --spack-commit= --fetch-jobs= --bootstrap-mirror= --view= --trace=")" -- "$cur")
+      ;;
+
+    'cache'*)
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --evict --max-size= --ccache-max-size= --clear-ccache")" -- "$cur")
+      ;;
+
+    'plan'*)
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --configs= --prefix= --compiler= --spack-branch= --spack-commit=")" -- "$cur")
       ;;
 
     'delete'*)
-      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --id --only-spackter-entry $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")")" -- "$cur")
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --id --only-spackter-entry --wait $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")")" -- "$cur")
+      ;;
+
+    'export'*)
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -A file -W "$(_spackter_completions_filter "--help --id $(spackter list | grep -e "SPACKTER" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")")" -- "$cur")
+      ;;
+
+    'import'*)
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -A file -W "$(_spackter_completions_filter "--help --prefix=")" -- "$cur")
       ;;
 
     'list'*)
@@ -44,12 +60,16 @@ _spackter_completions() {
       while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --id --only-env-script= $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")")" -- "$cur")
       ;;
 
+    'verify'*)
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --id --all --format= --jobs= --no-cache $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")")" -- "$cur")
+      ;;
+
     'add'*)
       while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -A directory -W "$(_spackter_completions_filter "--help --env-script=")" -- "$cur")
       ;;
 
     *)
-      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --version add create delete list load")" -- "$cur")
+      while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "$(_spackter_completions_filter "--help --version add cache create delete export import list load plan verify")" -- "$cur")
       ;;
 
   esac
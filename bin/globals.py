@@ -1,4 +1,12 @@
-from rich.console import Console
-
 __version__ = "1.0.1"
-console = Console()
+
+
+# The rich console is created on first use, importing rich.console is slow
+def __getattr__(name):
+    if name == "console":
+        global console
+        from rich.console import Console
+
+        console = Console()
+        return console
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
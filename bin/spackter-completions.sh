@@ -14,12 +14,32 @@ _spackter_completions() {
     case "$compline" in
     'create'*)
         compopt -o nospace
-        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--configs=' '--prefix=' '--compiler=' '--allow-errors=' '--no-allow-errors=' '--create-mirror=' '--with-mirror=' '--spack-branch=' '--spack-commit='" -- "$cur")
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--configs=' '--prefix=' '--compiler=' '--allow-errors=' '--no-allow-errors=' '--create-mirror=' '--with-mirror=' '--spack-branch=' '--spack-commit=' '--fetch-jobs=' '--bootstrap-mirror=' '--view=' '--trace='" -- "$cur")
+        ;;
+
+    'cache'*)
+        compopt -o nospace
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--evict ' '--max-size=' '--ccache-max-size=' '--clear-ccache '" -- "$cur")
+        ;;
+
+    'plan'*)
+        compopt -o nospace
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--configs=' '--prefix=' '--compiler=' '--spack-branch=' '--spack-commit='" -- "$cur")
         ;;
 
     'delete'*)
         compopt -o nospace
-        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--id ' '--only-spackter-entry ' $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")" -- "$cur")
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--id ' '--only-spackter-entry ' '--wait ' $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")" -- "$cur")
+        ;;
+
+    'export'*)
+        compopt -o nospace
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -A file -W "'--help' '--id ' $(spackter list | grep -e "SPACKTER" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")" -- "$cur")
+        ;;
+
+    'import'*)
+        compopt -o nospace
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -A file -W "'--help' '--prefix='" -- "$cur")
         ;;
 
     'list'*)
@@ -32,6 +52,11 @@ _spackter_completions() {
         while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--id ' '--only-env-script=' $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")" -- "$cur")
         ;;
 
+    'verify'*)
+        compopt -o nospace
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--id ' '--all ' '--format=' '--jobs=' '--no-cache ' $(spackter list | grep -e "SPACKTER" -e "EXTERN" | tr -s " " | cut -d " " -f 2 | paste -s -d " ")" -- "$cur")
+        ;;
+
     'add'*)
         compopt -o nospace
         while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -A directory -W "'--help' '--env-script='" -- "$cur")
@@ -39,7 +64,7 @@ _spackter_completions() {
 
     *)
         compopt -o nospace
-        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--version' 'add ' 'create ' 'delete ' 'list ' 'load '" -- "$cur")
+        while read -r; do COMPREPLY+=("$REPLY"); done < <(compgen -W "'--help' '--version' 'add ' 'cache ' 'create ' 'delete ' 'export ' 'import ' 'list ' 'load ' 'plan ' 'verify '" -- "$cur")
         ;;
 
     esac
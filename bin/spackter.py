@@ -1,56 +1,133 @@
 from typing import Optional
 
-import spackter_add
-import spackter_create
-import spackter_delete
-import spackter_list
-import spackter_load
 import typer
 from globals import __version__
 from rich import print
+from typer.core import TyperGroup
 from typing_extensions import Annotated
 
-spackter = typer.Typer()
-
-
-spackter.command(
-    help="""
+try:
+    # Private typer API, the commands are registered eagerly if it changes
+    from typer.main import get_command_from_info
+    from typer.models import CommandInfo
+except ImportError:
+    get_command_from_info = None
+
+# The command modules import heavy dependencies (GitPython, requests, rich tables, asyncio),
+# so each one is only imported when its command runs. This keeps often used read-only
+# commands like 'spackter load --only-env-script' fast on busy login nodes.
+COMMANDS = {
+    "add": (
+        "spackter_add",
+        "add",
+        """
     Add a spack stack that was not created by spackter to the database.
-    """
-)(spackter_add.add)
-
-
-spackter.command(
-    help="""
+    """,
+    ),
+    "delete": (
+        "spackter_delete",
+        "delete",
+        """
     Deletes a spack stack.
     --only-spackter-entry can be set to only remove the spackter database entry and not delete the spack stack from disk.
-    """
-)(spackter_delete.delete)
-
-
-spackter.command(
-    help="""
+    """,
+    ),
+    "load": (
+        "spackter_load",
+        "load",
+        """
     Outputs the location of the 'env.sh' script that needs to be sourced to activate 
     the given spack stack.
-    """
-)(spackter_load.load)
-
-
-spackter.command(
-    help="""
+    """,
+    ),
+    "list": (
+        "spackter_list",
+        "list",
+        """
     Lists all currently installed spack stacks.
-    """
-)(spackter_list.list)
-
-
-spackter.command(
-    help="""
+    """,
+    ),
+    "create": (
+        "spackter_create",
+        "create",
+        """
     Create a new spack stack with a given name.
     'SPACKTER_ROOT/configs' contains directories with spack and spackter 
     configurations files which are used during creation.
     See 'default' and 'test' directories for examples.
-    """
-)(spackter_create.create)
+    """,
+    ),
+    "cache": (
+        "spackter_cache",
+        "cache",
+        """
+    Shows statistics of the source cache and the ccache that are shared by all spack stacks.
+    --evict removes the least recently used sources until the cache fits into the size limit
+    set with --max-size. --ccache-max-size and --clear-ccache manage the shared ccache.
+    """,
+    ),
+    "plan": (
+        "spackter_plan",
+        "plan",
+        """
+    Estimates the work of a 'spackter create' without creating the spack stack.
+    Checks whether patches and pull requests apply, concretizes the package list in a scratch
+    spack checkout and reports for each package if it is already installed in an upstream stack,
+    available from a build cache or needs to be built from source.
+    """,
+    ),
+    "verify": (
+        "spackter_verify",
+        "verify",
+        """
+    Checks that spack stacks still work: the env script exists, spack runs, the install
+    database is readable and the recorded packages are still installed.
+    Results of healthy stacks are cached until one of the checked files changes.
+    """,
+    ),
+    "export": (
+        "spackter_export",
+        "export",
+        """
+    Packs a spack stack with its spack checkout, configuration, install tree and spackter
+    database entry into a zstd (or gzip) compressed tar archive.
+    """,
+    ),
+    "import": (
+        "spackter_export",
+        "import_",
+        """
+    Unpacks a spack stack written by 'spackter export', relocates it to the new prefix
+    and adds it to the spackter database.
+    """,
+    ),
+}
+
+
+class LazyGroup(TyperGroup):
+    def list_commands(self, ctx) -> list[str]:
+        return list(COMMANDS)
+
+    def get_command(self, ctx, cmd_name: str):
+        if cmd_name not in self.commands and cmd_name in COMMANDS:
+            module_name, function_name, help = COMMANDS[cmd_name]
+            # Unlike importlib.import_module, __import__ is reported by 'python -X importtime'
+            callback = getattr(__import__(module_name), function_name)
+            self.commands[cmd_name] = get_command_from_info(
+                CommandInfo(name=cmd_name, callback=callback, help=help),
+                pretty_exceptions_short=spackter.pretty_exceptions_short,
+                rich_markup_mode=self.rich_markup_mode,
+            )
+        return self.commands.get(cmd_name)
+
+
+if get_command_from_info:
+    spackter = typer.Typer(cls=LazyGroup)
+else:
+    spackter = typer.Typer()
+    for cmd_name, (module_name, function_name, help) in COMMANDS.items():
+        callback = getattr(__import__(module_name), function_name)
+        spackter.command(name=cmd_name, help=help)(callback)
 
 
 def version_callback(value: bool):
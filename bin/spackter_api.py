@@ -0,0 +1,311 @@
+# Non-interactive Python interface to spackter.
+# The functions in this module never print, prompt or exit. They return the spackter
+# database entries of spack stacks as dicts (with the added 'spack_root' key) and
+# raise the SpackterError subclasses below. The spackter commands are wrappers on top.
+# The '*_async' variants run spackter and spack as asyncio subprocesses, so one
+# Python process can drive many stack creations and queries concurrently. Only the
+# output of a creation is shown, it is streamed to a log file or stdout while it runs.
+# asyncio, json, tempfile and the trash module are only imported by the functions that
+# need them, as 'spackter load' imports this module and has to start fast.
+
+import os
+import shlex
+import subprocess
+import sys
+from pathlib import Path
+from typing import Iterable, Optional
+
+from spackter_util import (
+    get_spackter_root,
+    read_stacks_file,
+    remove_stack,
+    update_stacks_file,
+)
+
+# Phases of 'spackter create' whose errors can be ignored
+ERROR_PHASES = ["patch", "pr", "package", "script"]
+
+
+class SpackterError(Exception):
+    pass
+
+
+class StackNotFoundError(SpackterError):
+    pass
+
+
+class AmbiguousStackError(SpackterError):
+    def __init__(self, message: str, stacks: list[dict]):
+        super().__init__(message)
+        self.stacks = stacks
+
+
+class StackExistsError(SpackterError):
+    pass
+
+
+class InvalidStackError(SpackterError):
+    pass
+
+
+class CreateError(SpackterError):
+    pass
+
+
+class CommandError(SpackterError):
+    def __init__(self, message: str, result: subprocess.CompletedProcess):
+        super().__init__(message)
+        self.result = result
+
+
+def list_stacks(name: Optional[str] = None) -> list[dict]:
+    stacks = read_stacks_file()
+    result = []
+    for entry in stacks:
+        if not entry == "data":
+            if name is None or stacks[entry]["name"] == name:
+                result.append(dict(stacks[entry], spack_root=entry))
+    return result
+
+
+def get_stack(name: str, id: Optional[bool] = False) -> dict:
+    if id:
+        if not name.isdigit():
+            raise StackNotFoundError(f"Could not find a spack stack with the id '{name}'.")
+        selected = [stack for stack in list_stacks() if stack["id"] == int(name)]
+    else:
+        selected = list_stacks(name)
+    if not selected:
+        if id:
+            raise StackNotFoundError(f"Could not find a spack stack with the id '{name}'.")
+        raise StackNotFoundError(f"Could not find a spack stack with the name '{name}'.")
+    if len(selected) > 1:
+        raise AmbiguousStackError(
+            f"There are multiple spack stacks with the name '{name}'.", selected
+        )
+    return selected[0]
+
+
+def register_stack(spack_root: Path, spackter_entry: dict) -> dict:
+    key = spack_root.resolve().as_posix()
+    # Concurrent creates would otherwise overwrite each other's entries
+    with update_stacks_file() as stacks:
+        if key in stacks:
+            raise StackExistsError(f"There already exists a spack stack at: {spack_root}")
+        spackter_entry["id"] = stacks["data"]["id_counter"] + 1
+        stacks[key] = spackter_entry
+        stacks["data"]["id_counter"] += 1
+        stacks["data"]["stack_count"] += 1
+    return dict(spackter_entry, spack_root=key)
+
+
+def add_stack(name: str, spack_root: Path, env_script: Optional[Path] = None) -> dict:
+    spack_root = spack_root.expanduser().resolve()
+    if not spack_root.exists():
+        raise InvalidStackError(f"Directory does not exist: {spack_root}")
+    if not (spack_root / "bin/spack").exists():
+        raise InvalidStackError(f"The given directory is not a spack installation: {spack_root}")
+
+    if env_script:
+        env_script_path = Path(env_script).expanduser().resolve()
+        if not env_script_path.exists():
+            raise InvalidStackError(f"Could not find a env script at: {env_script_path}")
+    else:
+        env_script_path = (spack_root / "share/spack/setup-env.sh").resolve()
+        if not env_script_path.exists():
+            raise InvalidStackError(f"Could not find a default env script at: {env_script_path}")
+
+    spackter_entry = {}
+    spackter_entry["name"] = name
+    spackter_entry["prefix"] = spack_root.parent.resolve().as_posix()
+    spackter_entry["compiler"] = "UNKNOWN"
+    spackter_entry["type"] = "EXTERN"
+    spackter_entry["configs"] = "UNKNOWN"
+    spackter_entry["env_script"] = env_script_path.as_posix()
+    spackter_entry["created"] = "UNKNOWN"
+    spackter_entry["post_install"] = {}
+    spackter_entry["packages"] = []
+    spackter_entry["pull_requests"] = []
+    spackter_entry["patches"] = []
+    spackter_entry["spack_version"] = "UNKNOWN VERSION"
+    return register_stack(spack_root, spackter_entry)
+
+
+def delete_stack(
+    name: str,
+    id: Optional[bool] = False,
+    only_spackter_entry: bool = False,
+    wait: bool = False,
+    show_progress: bool = False,
+) -> Optional[Path]:
+    # Only imported here, it pulls in concurrent.futures for the parallel deletion
+    from spackter_trash import move_to_trash, purge, purge_in_background
+
+    stack = get_stack(name, id)
+    spack_root = Path(stack["spack_root"])
+    trash_path = None
+    if not only_spackter_entry and spack_root.exists():
+        trash_path = move_to_trash(spack_root)
+    remove_stack(spack_root)
+    if trash_path:
+        if wait:
+            purge(trash_path, show_progress=show_progress)
+        else:
+            purge_in_background(trash_path)
+    return trash_path
+
+
+def get_env_script(name: str, id: Optional[bool] = False) -> Path:
+    return Path(get_stack(name, id)["env_script"])
+
+
+async def create_stack_async(
+    name: str,
+    configs: str = "default",
+    prefix: Optional[Path] = None,
+    compiler: Optional[str] = None,
+    allow_errors: Iterable[str] = (),
+    spack_branch: Optional[str] = None,
+    spack_commit: Optional[str] = None,
+    view: Optional[str] = None,
+    fetch_jobs: int = 4,
+    trace: Optional[Path] = None,
+    bootstrap_mirror: Optional[Path] = None,
+    log: Optional[Path] = None,
+) -> dict:
+    import asyncio
+    import json
+    import tempfile
+
+    prefix = prefix.expanduser().resolve() if prefix else get_spackter_root() / "spack"
+    if (prefix / name).exists():
+        raise StackExistsError(f"There already exists a directory at: {prefix / name}")
+
+    # Every phase needs a decision up front: errors in the given phases are ignored,
+    # errors in all other phases abort the creation
+    allowed = set(allow_errors)
+    if "all" in allowed:
+        allowed = set(ERROR_PHASES)
+    if allowed - set(ERROR_PHASES):
+        raise ValueError(f"Unknown phases in allow_errors: {sorted(allowed - set(ERROR_PHASES))}")
+    options = {
+        "name": name,
+        "configs": configs,
+        "prefix": prefix.as_posix(),
+        "compiler": compiler,
+        "allow_errors_options": {phase: phase in allowed for phase in ERROR_PHASES},
+        "spack_branch": spack_branch,
+        "spack_commit": spack_commit,
+        "view": view,
+        "fetch_jobs": fetch_jobs,
+        "trace": trace.expanduser().resolve().as_posix() if trace else None,
+        "bootstrap_mirror": bootstrap_mirror.expanduser().resolve().as_posix() if bootstrap_mirror else None,
+    }
+
+    # The creation runs in its own process, so many of them can run at the same time.
+    # Its output goes to the log file (or this process' stdout) while it runs.
+    fd, result_file = tempfile.mkstemp(prefix="spackter-create-", suffix=".json")
+    os.close(fd)
+    output = open(log, "a") if log else None
+    try:
+        cmd = [sys.executable, __file__, "create", json.dumps(options), result_file]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=output,
+            stderr=asyncio.subprocess.STDOUT if output else None,
+        )
+        returncode = await proc.wait()
+        with open(result_file, "r") as file:
+            result = json.loads(file.read() or "{}")
+    finally:
+        if output:
+            output.close()
+        os.remove(result_file)
+
+    if "stack" in result:
+        return result["stack"]
+    if result.get("error") == "StackExistsError":
+        raise StackExistsError(result["message"])
+    message = result.get("message", f"Creating '{name}' failed with return code {returncode}.")
+    raise CreateError(message)
+
+
+def create_stack(name: str, **kwargs) -> dict:
+    import asyncio
+
+    return asyncio.run(create_stack_async(name, **kwargs))
+
+
+def run_create(options: dict, result_file: Path):
+    # Runs in the process started by create_stack_async
+    import json
+
+    import typer
+    from spackter_create import create_spack_stack
+    from spackter_trace import start_trace
+
+    name = options["name"]
+    try:
+        if options["trace"]:
+            start_trace(Path(options["trace"]), f"spackter create {name}")
+        stack = create_spack_stack(
+            name,
+            options["configs"],
+            Path(options["prefix"]),
+            options["compiler"],
+            options["allow_errors_options"],
+            options["spack_branch"],
+            options["spack_commit"],
+            options["fetch_jobs"],
+            Path(options["bootstrap_mirror"]) if options["bootstrap_mirror"] else None,
+            options["view"],
+            overwrite=False,
+        )
+        result = {"stack": stack}
+    except SpackterError as e:
+        result = {"error": type(e).__name__, "message": str(e)}
+    except typer.Exit as e:
+        # The reason was already printed to the output of the creation
+        result = {"error": "CreateError", "message": f"Creating '{name}' failed with return code {e.exit_code}."}
+    with open(result_file, "w") as file:
+        file.write(json.dumps(result))
+    if "error" in result:
+        sys.exit(1)
+
+
+async def run_spack_async(
+    name: str, *args: str, id: Optional[bool] = False, check: bool = True
+) -> subprocess.CompletedProcess:
+    import asyncio
+
+    stack = get_stack(name, id)
+    cmd = f". {shlex.quote(stack['env_script'])} && spack " + shlex.join(args)
+    proc = await asyncio.create_subprocess_shell(
+        cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate()
+    result = subprocess.CompletedProcess(cmd, proc.returncode, stdout.decode(), stderr.decode())
+    if check and result.returncode:
+        raise CommandError(f"'spack {' '.join(args)}' failed with return code {result.returncode}", result)
+    return result
+
+
+def run_spack(name: str, *args: str, id: Optional[bool] = False, check: bool = True) -> subprocess.CompletedProcess:
+    import asyncio
+
+    return asyncio.run(run_spack_async(name, *args, id=id, check=check))
+
+
+if __name__ == "__main__":
+    import json
+
+    # Imported by name, so the exceptions raised by the other spackter modules are the same
+    # classes as the ones caught by run_create
+    from spackter_api import run_create
+
+    if len(sys.argv) == 4 and sys.argv[1] == "create":
+        run_create(json.loads(sys.argv[2]), Path(sys.argv[3]))
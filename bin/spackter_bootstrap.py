@@ -0,0 +1,61 @@
+from pathlib import Path
+from typing import Optional
+
+from spackter_trace import traced
+from spackter_util import (
+    get_spack_version,
+    get_spack_version_key,
+    get_spackter_root,
+    read_spack_config,
+    run_shell_cmd,
+    spackter_lock,
+    update_spack_config,
+)
+
+# Marks a bootstrap store that was fully populated by 'spack bootstrap now'
+BOOTSTRAPPED_MARKER = ".spackter-bootstrapped"
+
+
+def get_bootstrap_store(spack_version: str) -> Path:
+    return get_spackter_root() / "cache/bootstrap" / get_spack_version_key(spack_version)
+
+
+@traced
+def configure_bootstrap(
+    spack_root: Path,
+    spackter_config_dir: Path,
+    base_cmd: str,
+    bootstrap_mirror: Optional[Path] = None,
+):
+    user_config = read_spack_config(spackter_config_dir / "bootstrap.yaml")
+    if (user_config.get("bootstrap") or {}).get("root"):
+        print("===> Using bootstrap 'root' from the spackter config dir.")
+        return
+
+    # Bootstrapped tools (clingo, gnupg, ...) are shared by all stacks with the same spack version
+    spack_version = get_spack_version(base_cmd)
+    store = get_bootstrap_store(spack_version)
+    store.mkdir(parents=True, exist_ok=True)
+    print(f"===> Using shared bootstrap store at: {store}")
+    update_spack_config(spack_root, "bootstrap", {"root": store.as_posix()})
+
+    if bootstrap_mirror and bootstrap_mirror.exists():
+        print(f"===> Using bootstrap mirror at: {bootstrap_mirror}")
+        cmd = base_cmd
+        cmd += f"spack bootstrap add --scope site --trust spackter-sources {bootstrap_mirror}/metadata/sources;"
+        cmd += f"spack bootstrap add --scope site --trust spackter-binaries {bootstrap_mirror}/metadata/binaries;"
+        run_shell_cmd(cmd)
+
+    # Concurrent creates wait for the first one instead of bootstrapping into the same store
+    with spackter_lock(store.parent / f"{store.name}.lock"):
+        if (store / BOOTSTRAPPED_MARKER).exists():
+            print("===> Bootstrap store is already populated.")
+        elif run_shell_cmd(base_cmd + "spack bootstrap now;", error_exit=False):
+            (store / BOOTSTRAPPED_MARKER).touch()
+        else:
+            print("===> Warning: Could not populate the bootstrap store.")
+            print("===> spack will try to bootstrap again when it is first needed.")
+
+    if bootstrap_mirror and not bootstrap_mirror.exists():
+        print(f"===> Creating bootstrap mirror for offline nodes at: {bootstrap_mirror}")
+        run_shell_cmd(base_cmd + f"spack bootstrap mirror --binary-packages {bootstrap_mirror};")
@@ -0,0 +1,203 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+import typer
+from globals import console
+from rich.table import Table
+from spackter_ccache import (
+    clear_ccache_dir,
+    find_ccache,
+    format_hit_rate,
+    get_ccache_dir,
+    get_ccache_max_size,
+    read_ccache_stats,
+    set_ccache_max_size,
+)
+from spackter_trace import traced
+from spackter_util import (
+    format_size,
+    get_spackter_root,
+    parse_size,
+    read_spack_config,
+    read_stacks_file,
+    spackter_lock,
+    update_spack_config,
+    update_stacks_file,
+)
+from typing_extensions import Annotated
+
+def cache(
+    evict: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--evict",
+            help="""
+        Remove the least recently used files from the shared source cache until it fits into the size limit.
+        """,
+        ),
+    ] = False,
+    max_size: Annotated[
+        Optional[str],
+        typer.Option(
+            "--max-size",
+            help="""
+        Size limit for the shared source cache (e.g. '50G'). The limit is saved and used by
+        all following evictions, including the automatic one at the end of 'spackter create'.
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    ccache_max_size: Annotated[
+        Optional[str],
+        typer.Option(
+            "--ccache-max-size",
+            help="""
+        Size limit for the shared ccache directory (e.g. '100G'). ccache removes old entries
+        by itself when the limit is reached.
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    clear_ccache: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--clear-ccache",
+            help="""
+        Remove all entries from the shared ccache directory.
+        """,
+        ),
+    ] = False,
+):
+    if ccache_max_size:
+        if not set_ccache_max_size(parse_size(ccache_max_size)):
+            print("===> Error: Could not set the size limit of the shared ccache.")
+            raise typer.Exit(code=1)
+        print(f"===> ccache size limit set to {format_size(parse_size(ccache_max_size))}.")
+    if clear_ccache:
+        if not clear_ccache_dir():
+            print("===> Error: Could not clear the shared ccache.")
+            raise typer.Exit(code=1)
+        print("===> Cleared the shared ccache.")
+    if max_size:
+        set_source_cache_limit(parse_size(max_size))
+    if evict:
+        limit = get_source_cache_limit()
+        if not limit:
+            print("===> Error: No size limit set for the source cache. Use '--max-size'.")
+            raise typer.Exit(code=1)
+        if not evict_source_cache(limit):
+            print("===> The source cache is in use by a running 'spackter create'. Try again later.")
+            raise typer.Exit(code=1)
+    print_cache_stats()
+
+
+def get_source_cache_dir() -> Path:
+    return get_spackter_root() / "cache/source"
+
+
+def get_source_cache_limit() -> int:
+    stacks = read_stacks_file()
+    if stacks:
+        return stacks["data"].get("source_cache_limit", 0)
+    return 0
+
+
+def set_source_cache_limit(limit: int):
+    if not read_stacks_file():
+        print("===> Error: The spackter database is empty. Create or add a spack stack first.")
+        raise typer.Exit(code=1)
+    with update_stacks_file() as stacks:
+        stacks["data"]["source_cache_limit"] = limit
+    print(f"===> Source cache size limit set to {format_size(limit)}.")
+
+
+def source_cache_lock(shared: bool, blocking: bool):
+    # 'spackter create' holds a shared lock while it fetches into the cache,
+    # evictions need the exclusive lock so they never remove files that are being used
+    return spackter_lock(get_spackter_root() / "cache/source.lock", shared, blocking)
+
+
+@traced
+def configure_source_cache(spack_root: Path, spackter_config_dir: Path):
+    user_config = read_spack_config(spackter_config_dir / "config.yaml")
+    if (user_config.get("config") or {}).get("source_cache"):
+        print("===> Using 'source_cache' from the spackter config dir.")
+        return
+    source_cache = get_source_cache_dir()
+    source_cache.mkdir(parents=True, exist_ok=True)
+    print(f"===> Using shared source cache at: {source_cache}")
+    update_spack_config(spack_root, "config", {"source_cache": source_cache.as_posix()})
+
+
+def scan_source_cache() -> list[tuple[float, int, str]]:
+    return scan_cache_dir(get_source_cache_dir())
+
+
+def scan_cache_dir(cache_dir: Path) -> list[tuple[float, int, str]]:
+    files = []
+    for root, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if os.path.islink(path):
+                continue
+            stat = os.stat(path)
+            files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+    return files
+
+
+@traced
+def evict_source_cache(limit: int) -> bool:
+    with source_cache_lock(shared=False, blocking=False) as locked:
+        if not locked:
+            return False
+        files = sorted(scan_source_cache())
+        total = sum(file[1] for file in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= limit:
+                break
+            os.unlink(path)
+            total -= size
+            removed += 1
+
+        # Remove the per package symlinks that pointed to evicted archives and empty dirs
+        for root, dirnames, filenames in os.walk(get_source_cache_dir(), topdown=False):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if os.path.islink(path) and not os.path.exists(path):
+                    os.unlink(path)
+            for dirname in dirnames:
+                path = os.path.join(root, dirname)
+                if not os.path.islink(path) and not os.listdir(path):
+                    os.rmdir(path)
+        print(f"===> Evicted {removed} files from the source cache.")
+    return True
+
+
+def print_cache_stats():
+    files = scan_source_cache()
+    limit = get_source_cache_limit()
+    table = Table("Spackter source cache", show_header=True)
+    t1 = Table(show_header=False)
+    t1.add_row("Location", get_source_cache_dir().as_posix())
+    t1.add_row("Files", f"{len(files)}")
+    t1.add_row("Size", format_size(sum(file[1] for file in files)))
+    t1.add_row("Limit", format_size(limit) if limit else "None")
+    table.add_row(t1)
+    console.print(table)
+
+    ccache = find_ccache()
+    files = scan_cache_dir(get_ccache_dir())
+    max_size = get_ccache_max_size()
+    stats = read_ccache_stats(ccache) if ccache else {}
+    hits = stats.get("direct_cache_hit", 0) + stats.get("preprocessed_cache_hit", 0)
+    table = Table("Spackter ccache", show_header=True)
+    t1 = Table(show_header=False)
+    t1.add_row("Location", get_ccache_dir().as_posix())
+    t1.add_row("ccache", ccache if ccache else "Not found")
+    t1.add_row("Size", format_size(sum(file[1] for file in files)))
+    t1.add_row("Limit", format_size(max_size) if max_size else "None")
+    t1.add_row("Hit rate", format_hit_rate(hits, stats.get("cache_miss", 0)))
+    table.add_row(t1)
+    console.print(table)
@@ -0,0 +1,131 @@
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from spackter_compilers import get_compiler, read_compilers_file
+from spackter_trace import traced
+from spackter_util import (
+    get_spackter_root,
+    parse_size,
+    read_spack_config,
+    update_spack_config,
+)
+
+# All spack stacks created by spackter compile through one ccache directory at
+# 'SPACKTER_ROOT/cache/ccache'. If ccache is not installed on the system it is built
+# once per spack version in the shared compiler tree, like the compilers.
+CCACHE_SPEC = "ccache"
+
+
+def get_ccache_dir() -> Path:
+    return get_spackter_root() / "cache/ccache"
+
+
+def find_ccache() -> Optional[str]:
+    ccache = shutil.which("ccache")
+    if ccache:
+        return ccache
+    for entry in read_compilers_file().get(CCACHE_SPEC, []):
+        binary = Path(entry["prefix"]) / "bin/ccache"
+        if binary.exists():
+            return binary.as_posix()
+    return None
+
+
+@traced
+def configure_ccache(spack_root: Path, spackter_config_dir: Path, base_cmd: str) -> Optional[str]:
+    user_config = read_spack_config(spackter_config_dir / "config.yaml")
+    if "ccache" in (user_config.get("config") or {}):
+        print("===> Using 'ccache' from the spackter config dir.")
+        return None
+
+    # spack only looks for ccache on the PATH and fails if 'ccache: true' is set without it,
+    # so it has to be available before the option is enabled
+    ccache = shutil.which("ccache")
+    if not ccache:
+        prefix, _ = get_compiler(CCACHE_SPEC, base_cmd, kind="build tool")
+        ccache = f"{prefix}/bin/ccache"
+    ccache_dir = get_ccache_dir()
+    ccache_dir.mkdir(parents=True, exist_ok=True)
+    print(f"===> Using shared ccache directory at: {ccache_dir}")
+    update_spack_config(spack_root, "config", {"ccache": True})
+    return ccache
+
+
+def get_ccache_env(ccache: str) -> str:
+    return f"export CCACHE_DIR={get_ccache_dir()};export PATH={Path(ccache).parent}:$PATH;"
+
+
+def get_ccache_activation(ccache: str) -> str:
+    activation = "# Shared ccache of all spack stacks, needed by 'config:ccache' of this stack\n"
+    activation += f"export CCACHE_DIR={get_ccache_dir()}\n"
+    activation += f'export PATH="{Path(ccache).parent}:$PATH"\n'
+    return activation
+
+
+def run_ccache(ccache: str, *args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, CCACHE_DIR=get_ccache_dir().as_posix())
+    return subprocess.run([ccache, *args], capture_output=True, text=True, env=env)
+
+
+def read_ccache_stats(ccache: str) -> dict[str, int]:
+    # '--print-stats' needs ccache 4, older versions are not counted
+    result = run_ccache(ccache, "--print-stats")
+    if result.returncode:
+        return {}
+    stats = {}
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition("\t")
+        if value.isdigit():
+            stats[key] = int(value)
+    return stats
+
+
+def get_ccache_hits(before: dict[str, int], after: dict[str, int]) -> dict[str, int]:
+    # Compilations of other creates that run at the same time are counted as well
+    def diff(key: str) -> int:
+        return after.get(key, 0) - before.get(key, 0)
+
+    return {
+        "hits": diff("direct_cache_hit") + diff("preprocessed_cache_hit"),
+        "misses": diff("cache_miss"),
+    }
+
+
+def format_hit_rate(hits: int, misses: int) -> str:
+    if not hits + misses:
+        return "-"
+    return f"{hits / (hits + misses):.0%} ({hits} of {hits + misses})"
+
+
+def set_ccache_max_size(max_size: int) -> bool:
+    ccache = find_ccache()
+    if not ccache:
+        return False
+    get_ccache_dir().mkdir(parents=True, exist_ok=True)
+    # The limit is stored in the ccache.conf of the directory and enforced by ccache itself
+    return run_ccache(ccache, f"--max-size={max_size // 1024}Ki").returncode == 0
+
+
+def get_ccache_max_size() -> int:
+    ccache = find_ccache()
+    if not ccache:
+        return 0
+    result = run_ccache(ccache, "--get-config=max_size")
+    if result.returncode:
+        return 0
+    # e.g. '5.0 GB', '5GiB' or '5368709120', unknown formats are shown as unlimited
+    max_size = result.stdout.strip().replace(" ", "").upper().removesuffix("B")
+    if not re.fullmatch(r"\d+(\.\d+)?([KMGT]I?)?", max_size):
+        return 0
+    return parse_size(max_size)
+
+
+def clear_ccache_dir() -> bool:
+    ccache = find_ccache()
+    if not ccache:
+        return False
+    return run_ccache(ccache, "--clear").returncode == 0
@@ -0,0 +1,109 @@
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import typer
+from spackter_trace import traced
+from spackter_util import (
+    get_spack_version,
+    get_spack_version_key,
+    get_spackter_root,
+    read_yaml_file,
+    run_shell_cmd,
+    spackter_lock,
+    update_spack_config,
+    update_yaml_file,
+)
+
+# Compilers built by spackter are installed into a shared install tree per spack version
+# at 'SPACKTER_ROOT/compilers/<spack version>' and used by all spack stacks as an upstream.
+# 'SPACKTER_ROOT/data/compilers.yaml' maps each compiler spec and spack version to its prefix.
+UPSTREAM_NAME = "spackter-compilers"
+
+
+def get_compiler_install_tree(spack_version: str) -> Path:
+    return get_spackter_root() / "compilers" / get_spack_version_key(spack_version)
+
+
+def get_compilers_file() -> Path:
+    return get_spackter_root() / "data/compilers.yaml"
+
+
+def read_compilers_file() -> dict:
+    return read_yaml_file(get_compilers_file())
+
+
+def find_compiler(compiler: str, spack_version: str) -> Optional[str]:
+    for entry in read_compilers_file().get(compiler, []):
+        if entry["spack_version"] == spack_version and Path(entry["prefix"]).exists():
+            return entry["prefix"]
+    return None
+
+
+def build_compiler(compiler: str, spack_version: str, base_cmd: str, kind: str = "compiler") -> str:
+    install_tree = get_compiler_install_tree(spack_version)
+    install_cmd = base_cmd + f"spack -c config:install_tree:root:{install_tree} "
+    print(f"===> Building {kind} {compiler} in the shared compiler tree: {install_tree}")
+    run_shell_cmd(install_cmd + f"install {compiler};")
+
+    result = subprocess.run(
+        install_cmd + f"location --install-dir {compiler};",
+        capture_output=True,
+        text=True,
+        shell=True,
+    )
+    if result.returncode:
+        print(f"===> Error: Could not find the install prefix of {compiler}.")
+        print(result.stderr)
+        print("===> Exiting.")
+        raise typer.Exit(code=1)
+    prefix = result.stdout.strip()
+
+    # The per version build locks do not cover the file, which lists all spack versions
+    with update_yaml_file(get_compilers_file()) as compilers:
+        entries = [
+            entry
+            for entry in compilers.get(compiler, [])
+            if entry["spack_version"] != spack_version
+        ]
+        entries.append(
+            {
+                "spack_version": spack_version,
+                "install_tree": install_tree.as_posix(),
+                "prefix": prefix,
+            }
+        )
+        compilers[compiler] = entries
+    return prefix
+
+
+@traced
+def get_compiler(compiler: str, base_cmd: str, kind: str = "compiler") -> tuple[str, Path]:
+    # Build tools like ccache are shared the same way, 'kind' is only used in the output
+    spack_version = get_spack_version(base_cmd)
+    install_tree = get_compiler_install_tree(spack_version)
+    prefix = find_compiler(compiler, spack_version)
+    if prefix:
+        print(f"===> Reusing {kind} {compiler} from: {prefix}")
+        return prefix, install_tree
+
+    # Concurrent creates wait for each other instead of building the same compiler twice
+    with spackter_lock(install_tree.parent / f"{install_tree.name}.lock"):
+        prefix = find_compiler(compiler, spack_version)
+        if prefix:
+            print(f"===> Reusing {kind} {compiler} from: {prefix}")
+        else:
+            prefix = build_compiler(compiler, spack_version, base_cmd, kind)
+    return prefix, install_tree
+
+
+@traced
+def use_compiler(spack_root: Path, base_cmd: str, prefix: str, install_tree: Path):
+    print(f"===> Adding shared compiler tree as upstream: {install_tree}")
+    update_spack_config(
+        spack_root,
+        "upstreams",
+        {UPSTREAM_NAME: {"install_tree": install_tree.as_posix()}},
+    )
+    cmd = base_cmd + f"spack compiler find --scope site {prefix};"
+    run_shell_cmd(cmd)
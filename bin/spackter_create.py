@@ -1,21 +1,44 @@
+import re
 import shutil
 import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date
 from pathlib import Path
 from typing import Optional, Union
 
 import requests
 import typer
-from git import Repo
-from globals import __version__
+from git import GitCommandError, Repo
+from spackter_api import register_stack, StackExistsError
+from spackter_bootstrap import configure_bootstrap
+from spackter_cache import (
+    configure_source_cache,
+    evict_source_cache,
+    get_source_cache_limit,
+    source_cache_lock,
+)
+from spackter_ccache import (
+    configure_ccache,
+    get_ccache_activation,
+    get_ccache_env,
+    get_ccache_hits,
+    read_ccache_stats,
+)
+from spackter_compilers import get_compiler, use_compiler
 from spackter_list import print_create_summary
+from spackter_modules import get_installed_hashes, refresh_modules
+from spackter_trace import start_trace, trace_span, traced
+from spackter_trash import move_to_trash, purge_in_background
 from spackter_util import (
+    get_base_cmd,
+    get_spack_version,
     get_spackter_root,
-    read_stacks_file,
     remove_stack,
     run_shell_cmd,
-    write_stacks_file,
+    warm_spack_caches,
 )
+from spackter_view import VIEW_TYPES, create_view, get_view_activation, replace_module_loads
 from typing_extensions import Annotated
 
 
@@ -92,7 +115,93 @@ def create(
             show_default=False,
         ),
     ] = None,
+    fetch_jobs: Annotated[
+        int,
+        typer.Option(
+            "--fetch-jobs",
+            help="""
+        Number of concurrent 'spack fetch' processes that download the sources of all packages
+        ahead of the installation. 0 lets every 'spack install' fetch its own sources.
+        """,
+        ),
+    ] = 4,
+    bootstrap_mirror: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--bootstrap-mirror",
+            help="""
+        Path to a spack bootstrap mirror. If it exists it is used to bootstrap spack without
+        internet access, otherwise it is created from the bootstrap store of this stack.
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    view: Annotated[
+        Optional[str],
+        typer.Option(
+            "--view",
+            help="""
+        Create a spack filesystem view of the installed packages, either 'symlink' or 'hardlink'.
+        The env script then adds only the view's 'bin' and 'lib' directories to the environment.
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    trace: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--trace",
+            help="""
+        Write a timeline of all phases and commands of this run to the given file.
+        The file uses the Chrome trace event format and can be opened with https://ui.perfetto.dev
+        """,
+            show_default=False,
+        ),
+    ] = None,
 ):
+    if trace:
+        start_trace(trace.expanduser().resolve(), f"spackter create {name}")
+    # Check --allow-errors and --no-allow-errors options, phases without a decision are asked for
+    allow_errors_options = get_allow_errors_options(allow_errors, no_allow_errors)
+    spackter_entry = create_spack_stack(
+        name,
+        configs,
+        prefix,
+        compiler,
+        allow_errors_options,
+        spack_branch,
+        spack_commit,
+        fetch_jobs,
+        bootstrap_mirror,
+        view,
+    )
+
+    ## Summary of spack stack creation
+    print_create_summary(spackter_entry)
+    print(
+        f"===> Use 'spackter load' to activate the stack or manually source: {spackter_entry['env_script']}"
+    )
+
+
+def create_spack_stack(
+    name: str,
+    configs: str = "default",
+    prefix: Optional[Path] = None,
+    compiler: Optional[str] = None,
+    allow_errors_options: Optional[dict[str, bool]] = None,
+    spack_branch: Optional[str] = None,
+    spack_commit: Optional[str] = None,
+    fetch_jobs: int = 4,
+    bootstrap_mirror: Optional[Path] = None,
+    view: Optional[str] = None,
+    overwrite: Optional[bool] = None,
+) -> dict:
+    # Runs all phases of 'spackter create' and returns the registered database entry.
+    # Phases missing from allow_errors_options and an existing spack root (overwrite=None)
+    # are asked for on the terminal, the Python API decides all of them up front.
+    if allow_errors_options is None:
+        allow_errors_options = {}
+
     ##
     ## Check arguments and env vars
     ##
@@ -115,8 +224,9 @@ def create(
 
     spack_root = prefix / name
 
-    # Check --allow-errors and --no-allow-errors options
-    allow_errors_options = get_allow_errors_options(allow_errors, no_allow_errors)
+    if view and view not in VIEW_TYPES:
+        print(f"===> Error: Unknown view type: {view}. Use one of: {VIEW_TYPES}")
+        raise typer.Exit(code=1)
 
     # Check branch and commit options
     if spack_branch and spack_commit:
@@ -129,7 +239,7 @@ def create(
     ##
 
     ## Create fresh spack repo
-    spack_repo = clone_spack(prefix, spack_root, spack_branch, spack_commit)
+    spack_repo = clone_spack(prefix, spack_root, spack_branch, spack_commit, overwrite)
     # Stores information about the spack stack that will be remembered by spackter
     spackter_entry = {}
     ## Apply patches
@@ -142,53 +252,88 @@ def create(
     )
     ## Copy spack config files
     copy_config_files(spack_root, spackter_config_dir)
+    ## Use the source cache shared by all spack stacks
+    configure_source_cache(spack_root, spackter_config_dir)
 
     ## Basic commands required to run a spack command
     spack_env_script = spack_root / "share/spack/setup-env.sh"
-    base_cmd = "export SPACK_DISABLE_LOCAL_CONFIG=1;"
-    base_cmd += f"export SPACK_USER_CACHE_PATH={spack_root}/cache;"
-    base_cmd += f". {spack_env_script};"
-
-    ## Install Compiler if needed
-    ## TODO WIP test this with spack 1.0.0
-    handle_compiler(compiler, base_cmd)
-    ## Install packages
-    spackter_entry["packages"] = handle_packages(
-        spackter_config_dir, base_cmd, compiler, allow_errors_options
+    base_cmd = get_base_cmd(spack_root)
+    ## Use the bootstrap store shared by all stacks with the same spack version
+    configure_bootstrap(
+        spack_root,
+        spackter_config_dir,
+        base_cmd,
+        bootstrap_mirror.expanduser().resolve() if bootstrap_mirror else None,
     )
+
+    with source_cache_lock(shared=True, blocking=True), ThreadPoolExecutor(
+        max_workers=max(fetch_jobs, 1)
+    ) as fetch_pool:
+        ## Fetch the sources of all packages in the background, while ccache, the compiler
+        ## and the packages before them are built
+        fetches = {}
+        if fetch_jobs > 0:
+            fetches = start_fetches(spackter_config_dir, base_cmd, fetch_pool)
+        try:
+            ## Compile through the ccache directory shared by all stacks
+            ccache = configure_ccache(spack_root, spackter_config_dir, base_cmd)
+            if ccache:
+                base_cmd = get_ccache_env(ccache) + base_cmd
+                ccache_before = read_ccache_stats(ccache)
+            ## Remember installed packages to only generate module files for new ones
+            installed_before = get_installed_hashes(base_cmd)
+            ## Build or reuse the compiler if needed
+            handle_compiler(compiler, base_cmd, spack_root)
+            ## Install packages
+            spackter_entry["packages"] = handle_packages(
+                spackter_config_dir, base_cmd, compiler, allow_errors_options, fetches=fetches
+            )
+        finally:
+            # Do not start queued downloads when the creation is aborted
+            fetch_pool.shutdown(cancel_futures=True)
+    if ccache:
+        spackter_entry["ccache"] = get_ccache_hits(ccache_before, read_ccache_stats(ccache))
+    ## Keep the shared source cache below its size limit
+    source_cache_limit = get_source_cache_limit()
+    if source_cache_limit:
+        evict_source_cache(source_cache_limit)
     ## Final steps of spack stack creation
-    spackter_entry["post_install"] = handle_epilogue(
-        base_cmd, spackter_config_dir, spack_root, allow_errors_options
+    spackter_entry["post_install"], spackter_entry["warm_caches"] = handle_epilogue(
+        base_cmd, spackter_config_dir, spack_root, allow_errors_options, installed_before
     )
+    ## Create a filesystem view of the installed packages
+    view_path = None
+    if view:
+        view_path = create_view(base_cmd, spack_root, view, spackter_entry["packages"], compiler)
+    spackter_entry["view"] = view_path.as_posix() if view_path else ""
     ## Generate env.sh script for this spack stack
-    generate_env_script(spackter_config_dir, spack_root, spack_env_script)
+    generate_env_script(spackter_config_dir, spack_root, spack_env_script, view_path, ccache)
     ## Create spackter entry for this spack stack
-    create_spackter_entry(
+    return create_spackter_entry(
         spackter_entry, name, prefix, compiler, configs, spack_root, base_cmd
     )
 
-    ## Summary of spack stack creation
-    print_create_summary(spackter_entry)
-    print(
-        f"===> Use 'spackter load' to activate the stack or manually source: {spackter_entry['env_script']}"
-    )
-
 
+@traced
 def clone_spack(
     prefix: Path,
     spack_root: Path,
     spack_branch: Optional[str],
     spack_commit: Optional[str],
+    overwrite: Optional[bool] = None,
 ) -> Repo:
     prefix.mkdir(parents=True, exist_ok=True)
     if spack_root.exists():
-        if typer.confirm(
+        if overwrite is False:
+            raise StackExistsError(f"There already exists a directory at: {spack_root}")
+        if overwrite or typer.confirm(
             "===> "
             + spack_root.resolve().as_posix()
             + " already exists. Overwrite it? (This will delete the whole directory)"
         ):
-            shutil.rmtree(spack_root)
+            trash_path = move_to_trash(spack_root)
             remove_stack(spack_root)
+            purge_in_background(trash_path)
         else:
             print("===> Exiting")
             raise typer.Exit()
@@ -213,8 +358,12 @@ def clone_spack(
     return spack_repo
 
 
+@traced
 def handle_patches(
-    spackter_config_dir: Path, spack_repo: Repo, allow_errors_options: dict[str, bool]
+    spackter_config_dir: Path,
+    spack_repo: Repo,
+    allow_errors_options: dict[str, bool],
+    dry_run: bool = False,
 ) -> list[tuple[str, bool]]:
     patches = []
     spackter_patch_dir = spackter_config_dir / "patches"
@@ -223,7 +372,7 @@ def handle_patches(
         if patch_files:
             print(f"===> Applying patches from: {spackter_patch_dir}")
             for file in patch_files:
-                result = apply_patch(file, spack_repo, allow_errors_options)
+                result = apply_patch(file, spack_repo, allow_errors_options, dry_run)
                 if result:
                     patches.append((file.name, True))
                 else:
@@ -236,8 +385,12 @@ def handle_patches(
     return patches
 
 
+@traced
 def handle_prs(
-    spackter_config_dir: Path, spack_repo: Repo, allow_errors_options: dict[str, bool]
+    spackter_config_dir: Path,
+    spack_repo: Repo,
+    allow_errors_options: dict[str, bool],
+    dry_run: bool = False,
 ) -> list[tuple[str, bool]]:
     pr_file = spackter_config_dir / "pull-requests.spackter"
     prs = []
@@ -247,7 +400,7 @@ def handle_prs(
             for line in file:
                 line = line.strip()
                 if line and not line.startswith("#"):
-                    result = apply_pr(line, spack_repo, allow_errors_options)
+                    result = apply_pr(line, spack_repo, allow_errors_options, dry_run)
                     if result:
                         prs.append((line, True))
                     else:
@@ -258,6 +411,7 @@ def handle_prs(
     return prs
 
 
+@traced
 def copy_config_files(spack_root: Path, spackter_config_dir: Path):
     spack_config_dir = spack_root / "etc/spack"
     print(f"===> Copying spack configuration files to {spack_config_dir}")
@@ -268,61 +422,142 @@ def copy_config_files(spack_root: Path, spackter_config_dir: Path):
 
 
 
-def handle_compiler(compiler: Optional[str], base_cmd: str):
-    ## TODO WIP with spack 1.0.0 this should not be needed anymore
-    # if compiler:
-    #     cmd = base_cmd + f"spack install {compiler};"
-    #     cmd += f"export location=$(spack location --install-dir {compiler});"
-    #     cmd += "spack compiler find ${location};"
-    #     print("===> Installing Compiler:")
-    #     run_shell_cmd(cmd)
-    return
-
+@traced
+def handle_compiler(compiler: Optional[str], base_cmd: str, spack_root: Path):
+    if compiler:
+        # The compiler is built once per spack version in a shared compiler tree
+        # and used by this stack as an upstream
+        prefix, install_tree = get_compiler(compiler, base_cmd)
+        use_compiler(spack_root, base_cmd, prefix, install_tree)
 
 
+@traced
 def handle_packages(
     spackter_config_dir: Path,
     base_cmd: str,
     compiler: Optional[str],
     allow_errors_options: dict[str, bool],
-) -> list[tuple[str, bool]]:
+    fetches: Optional[dict[str, Future]] = None,
+) -> list[tuple[str, bool, int]]:
     packages = []
     package_list = spackter_config_dir / "package-list.spackter"
     if package_list.exists():
-        with open(package_list, "r") as file:
-            for line in file:
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    result = spack_install(
-                        base_cmd, line, compiler, allow_errors_options
-                    )
-                    if result:
-                        packages.append((line, True))
-                    else:
-                        packages.append((line, False))
+        for line in read_package_list(package_list):
+            if fetches and line in fetches:
+                # Only the sources of this package are awaited, later downloads continue
+                with trace_span(f"wait for fetch {line}", "phase"):
+                    fetched = fetches[line].result().returncode == 0
+                if not fetched:
+                    handle_package_error(line, allow_errors_options)
+                    packages.append((line, False, 0))
+                    continue
+            start = time.monotonic()
+            result = spack_install(base_cmd, line, compiler, allow_errors_options)
+            # The build time is remembered for the estimates of 'spackter plan'
+            duration = round(time.monotonic() - start)
+            if result:
+                packages.append((line, True, duration))
+            else:
+                packages.append((line, False, duration))
     else:
         print(f"===> No package list file found at: {package_list}")
         print("===> No packages will be installed.")
     return packages
 
 
+@traced
+def concretize_packages(
+    spackter_config_dir: Path, base_cmd: str, compiler: Optional[str]
+) -> list[tuple[str, bool, list[tuple[str, str, str]]]]:
+    # Only concretizes and records the install status of every node, nothing is installed
+    packages = []
+    package_list = spackter_config_dir / "package-list.spackter"
+    if package_list.exists():
+        for line in read_package_list(package_list):
+            nodes = spack_spec(base_cmd, line, compiler)
+            packages.append((line, nodes is not None, nodes or []))
+    else:
+        print(f"===> No package list file found at: {package_list}")
+    return packages
+
+
+def read_package_list(package_list: Path) -> list[str]:
+    packages = []
+    with open(package_list, "r") as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                packages.append(line)
+    return packages
+
+
+def start_fetches(
+    spackter_config_dir: Path,
+    base_cmd: str,
+    fetch_pool: ThreadPoolExecutor,
+) -> dict[str, Future]:
+    package_list = spackter_config_dir / "package-list.spackter"
+    if not package_list.exists():
+        return {}
+    packages = read_package_list(package_list)
+    print(f"===> Fetching sources of {len(packages)} packages in the background")
+    fetches = {}
+    # Submitted in install order, so the first package is downloaded first
+    for package in packages:
+        fetches[package] = fetch_pool.submit(spack_fetch, base_cmd, package)
+        fetches[package].add_done_callback(
+            lambda fetch, package=package: report_fetch_failure(package, fetch)
+        )
+    return fetches
+
+
+def spack_fetch(base_cmd: str, package: str) -> subprocess.CompletedProcess:
+    # The fetches start before the compiler of '--compiler' is available, so the plain
+    # package spec is fetched. 'spack install' fetches any source that differs with it.
+    cmd = base_cmd + f"spack fetch --missing --dependencies {package};"
+    with trace_span(f"spack fetch {package}", "subprocess", cmd=cmd) as span:
+        result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+        span["exit_code"] = result.returncode
+    return result
+
+
+def report_fetch_failure(package: str, fetch: Future):
+    # Called as soon as the download finished. The output is only shown on errors,
+    # so it does not interleave with the build output.
+    if fetch.cancelled() or fetch.exception() or not fetch.result().returncode:
+        return
+    print(f"===> Error: Fetching sources of {package} failed:")
+    print(fetch.result().stdout)
+    print(fetch.result().stderr)
+
+
+@traced
 def handle_epilogue(
     base_cmd: str,
     spackter_config_dir: Path,
     spack_root: Path,
     allow_errors_options: dict[str, bool],
-) -> dict[str, Union[bool, str]]:
+    installed_before: set[str],
+) -> tuple[dict[str, Union[bool, str]], dict[str, float]]:
     # Remove all unneeded packages
     cmd = base_cmd + "spack gc --yes-to-all;"
     run_shell_cmd(cmd)
 
+    # Generate module files only for packages that were installed by this run
+    new_hashes = get_installed_hashes(base_cmd) - installed_before
+    refresh_modules(base_cmd, spack_root, new_hashes)
+
     # Run post-install-script
     post_install = handle_post_install_script(
         spackter_config_dir, spack_root, allow_errors_options
     )
-    return post_install
+
+    # Build the caches now, so the first spack command of a user is not slower than later ones
+    warm_caches = warm_spack_caches(base_cmd)
+    return post_install, warm_caches
 
 
+@traced
 def handle_post_install_script(
     spackter_config_dir: Path, spack_root: Path, allow_errors_options: dict[str, bool]
 ) -> dict[str, Union[bool, str]]:
@@ -355,8 +590,13 @@ def handle_post_install_script(
     return post_install
 
 
+@traced
 def generate_env_script(
-    spackter_config_dir: Path, spack_root: Path, spack_env_script: Path
+    spackter_config_dir: Path,
+    spack_root: Path,
+    spack_env_script: Path,
+    view: Optional[Path] = None,
+    ccache: Optional[str] = None,
 ):
     pre_script_path = spackter_config_dir / "pre-script.spackter"
     post_script_path = spackter_config_dir / "post-script.spackter"
@@ -371,7 +611,15 @@ def generate_env_script(
 
     pre_script = open(pre_script_path, "r")
     post_script = open(post_script_path, "r")
-    env_script = pre_script.read() + f". {spack_env_script}\n" + post_script.read()
+    env_script = pre_script.read() + f". {spack_env_script}\n"
+    if view:
+        env_script += get_view_activation(view)
+    if ccache:
+        env_script += get_ccache_activation(ccache)
+    if view:
+        env_script += replace_module_loads(post_script.read(), view)
+    else:
+        env_script += post_script.read()
     pre_script.close()
     post_script.close()
 
@@ -381,6 +629,7 @@ def generate_env_script(
         print(env_script)
 
 
+@traced
 def create_spackter_entry(
     spackter_entry: dict[str, Union[str, bool, Union[str, bool, int]]],
     name: str,
@@ -389,7 +638,7 @@ def create_spackter_entry(
     configs: str,
     spack_root: Path,
     base_cmd: str,
-):
+) -> dict:
     spackter_entry["name"] = name
     spackter_entry["prefix"] = prefix.resolve().as_posix()
     spackter_entry["compiler"] = compiler if compiler else ""
@@ -398,33 +647,16 @@ def create_spackter_entry(
     spackter_entry["env_script"] = (spack_root / "env.sh").resolve().as_posix()
     spackter_entry["created"] = f"{date.today()}"
 
-    cmd = base_cmd + "spack --version;"
-    result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
-    spackter_entry["spack_version"] = result.stdout.strip()
+    spackter_entry["spack_version"] = get_spack_version(base_cmd)
 
     # Save the entry
-    stacks = read_stacks_file()
-    if stacks:
-        if spack_root.resolve().as_posix() in stacks:
-            print("===> Error: Could not add spack stack to spackter.")
-            print(f"===> There already exists a spack stack at: {spack_root} ")
-            print("===> Exiting.")
-            raise typer.Exit(code=1)
-
-        spackter_entry["id"] = stacks["data"]["id_counter"] + 1
-        stacks[spack_root.resolve().as_posix()] = spackter_entry
-        stacks["data"]["id_counter"] += 1
-        stacks["data"]["stack_count"] += 1
-        write_stacks_file(stacks)
-    else:
-        stacks = {}
-        stacks["data"] = {}
-        stacks["data"]["stack_count"] = 1
-        stacks["data"]["id_counter"] = 1
-        stacks["data"]["spackter_version"] = __version__
-        spackter_entry["id"] = 1
-        stacks[spack_root.resolve().as_posix()] = spackter_entry
-        write_stacks_file(stacks)
+    try:
+        return register_stack(spack_root, spackter_entry)
+    except StackExistsError:
+        print("===> Error: Could not add spack stack to spackter.")
+        print(f"===> There already exists a spack stack at: {spack_root} ")
+        print("===> Exiting.")
+        raise typer.Exit(code=1)
 
 
 def get_allow_errors_options(
@@ -470,16 +702,20 @@ def get_allow_errors_options(
     return allow_errors_options
 
 
-def apply_patch(file: Path, spack_repo, allow_errors_options: dict[str, bool]):
+def apply_patch(
+    file: Path, spack_repo, allow_errors_options: dict[str, bool], dry_run: bool = False
+):
     print(f"===> Applying {file.name}")
     try:
         cmd = ["git", "apply", "--verbose", f"{file.resolve().as_posix()}"]
-        result = spack_repo.git.execute(cmd, with_extended_output=True)
+        result = git_apply(spack_repo, cmd, f"git apply {file.name}")
         print(result[1])
         print(result[2])
         return True
     except Exception as e:
         print(e)
+        if dry_run:
+            return False
         if "patch" in allow_errors_options:
             if allow_errors_options["patch"]:
                 print(f"===> Skipping patch: {file.name}")
@@ -492,20 +728,39 @@ def apply_patch(file: Path, spack_repo, allow_errors_options: dict[str, bool]):
         return False
 
 
-def apply_pr(pr: str, spack_repo, allow_errors_options: dict[str, bool]):
+def git_apply(spack_repo, cmd: list[str], name: str) -> tuple[int, str, str]:
+    # Runs git itself instead of through GitPython, which does not expose the process id.
+    # Failures raise GitCommandError like GitPython does.
+    with trace_span(name, "subprocess", cmd=" ".join(cmd)) as span, subprocess.Popen(
+        cmd, cwd=spack_repo.working_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    ) as proc:
+        span["pid"] = proc.pid
+        stdout, stderr = proc.communicate()
+        span["exit_code"] = proc.returncode
+    if proc.returncode:
+        raise GitCommandError(cmd, proc.returncode, stderr, stdout)
+    return proc.returncode, stdout.rstrip("\n"), stderr.rstrip("\n")
+
+
+def apply_pr(
+    pr: str, spack_repo, allow_errors_options: dict[str, bool], dry_run: bool = False
+):
     print(f"===> Applying PR {pr}")
     # TODO delete diff file while still getting error code from git apply command
-    pr_data = requests.get(f"https://github.com/spack/spack/pull/{pr}.diff")
+    with trace_span(f"download {pr}.diff", "network", pr=pr):
+        pr_data = requests.get(f"https://github.com/spack/spack/pull/{pr}.diff")
     with open(f"{spack_repo.working_dir}/{pr}.diff", "w") as file:
         file.write(pr_data.text)
     try:
         cmd = ["git", "apply", "--verbose", f"{pr}.diff"]
-        result = spack_repo.git.execute(cmd, with_extended_output=True)
+        result = git_apply(spack_repo, cmd, f"git apply {pr}.diff")
         print(result[1])
         print(result[2])
         return True
     except Exception as e:
         print(e)
+        if dry_run:
+            return False
         if "pr" in allow_errors_options:
             if allow_errors_options["pr"]:
                 print(f"===> Skipping PR: {pr}")
@@ -533,13 +788,43 @@ def spack_install(
     cmd += ";"
     result = run_shell_cmd(cmd, error_exit=False)
     if not result:
-        if "package" in allow_errors_options:
-            if allow_errors_options["package"]:
-                print(f"===> Skipping installing: {package}")
-            else:
-                print("===> Exiting.")
-                raise typer.Exit(code=1)
-        elif not typer.confirm(f"===> Skip installing {package}?"):
-            print("Exiting.")
-            raise typer.Exit(code=1)
+        handle_package_error(package, allow_errors_options)
     return result
+
+
+def handle_package_error(package: str, allow_errors_options: dict[str, bool]):
+    if "package" in allow_errors_options:
+        if allow_errors_options["package"]:
+            print(f"===> Skipping installing: {package}")
+        else:
+            print("===> Exiting.")
+            raise typer.Exit(code=1)
+    elif not typer.confirm(f"===> Skip installing {package}?"):
+        print("Exiting.")
+        raise typer.Exit(code=1)
+
+
+def spack_spec(
+    base_cmd: str, package: str, compiler: Optional[str]
+) -> Optional[list[tuple[str, str, str]]]:
+    print(f"===> Concretizing {package}")
+
+    cmd = base_cmd + f"spack spec --install-status --long {package}"
+    if compiler:
+        cmd += f" %{compiler}"
+    cmd += ";"
+    result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+    if result.returncode:
+        print(result.stdout)
+        print(result.stderr)
+        print(f"===> Error: Could not concretize {package}")
+        return None
+
+    # Lines look like: '[+]  abcdefg      ^zlib@1.3.1%gcc@13.2.0 ...'
+    # with '[+]' installed, '[^]' installed upstream, '[e]' external and '-' missing
+    nodes = []
+    for line in result.stdout.splitlines():
+        match = re.match(r"^\s*(\[\+\]|\[\^\]|\[e\]|-)\s+([a-z0-9]{7})\s+\^?(\S+)", line)
+        if match:
+            nodes.append((match.group(1), match.group(2), match.group(3)))
+    return nodes
@@ -1,12 +1,14 @@
 import typer
-import shutil
 from pathlib import Path
 from typing_extensions import Annotated
 from typing import Optional
 
-from spackter_util import select_stack
-from spackter_util import remove_stack
+from spackter_api import AmbiguousStackError
+from spackter_api import delete_stack
+from spackter_api import get_stack
+from spackter_api import StackNotFoundError
 from spackter_list import print_compact_list
+from spackter_trash import resume_pending_deletions
 
 
 
@@ -29,28 +31,42 @@ def delete(
         """
         Only remove the spack stack entry from spackter database and do not delete from disk.
         """
+        )] = False,
+    wait: Annotated[Optional[bool],
+        typer.Option("--wait", help=
+        """
+        Wait until the spack stack is removed from disk and show the progress,
+        instead of deleting it in the background.
+        """
         )] = False
 ):
-    selected = select_stack(name, id)
-    if not selected:
-        if id:
-            print(f"===> Could not find a spack stack with the id '{name}'.")
-        else:
-            print(f"===> Could not find a spack stack with the name '{name}'.")
+    resume_pending_deletions(wait=bool(wait))
+    try:
+        stack = get_stack(name, id)
+    except StackNotFoundError as e:
+        print(f"===> {e}")
         print("===> Aborting.")
         raise typer.Exit(code=1)
-    elif len(selected) > 1:
+    except AmbiguousStackError:
         print(f"===> There are multiple spack stacks with the name '{name}':")
         print_compact_list(only_name=name)
-        print("===> Use 'spackter load <id> --id' to specify the intended spack stack.")
+        print("===> Use 'spackter delete <id> --id' to specify the intended spack stack.")
         print(f"===> Aborting.")
         raise typer.Exit(code=1)
     else:
-        stack = selected[0][1]
-        spack_root = Path(selected[0][0])
-        if not only_spackter_entry and spack_root.exists():
-            if typer.confirm(f"===> Delete '{spack_root}' from disk?"):
-                shutil.rmtree(spack_root)
-                print(f"===> '{spack_root}' deleted.")
+        spack_root = Path(stack["spack_root"])
+        delete_from_disk = (
+            not only_spackter_entry
+            and spack_root.exists()
+            and typer.confirm(f"===> Delete '{spack_root}' from disk?")
+        )
         print(f"===> Removing '{stack['name']}' from spackter database.")
-        remove_stack(spack_root)
+        trash_path = delete_stack(
+            f"{stack['id']}",
+            id=True,
+            only_spackter_entry=not delete_from_disk,
+            wait=bool(wait),
+            show_progress=True,
+        )
+        if trash_path and not wait:
+            print(f"===> Deleting '{trash_path}' in the background.")
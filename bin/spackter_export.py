@@ -0,0 +1,334 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import typer
+import yaml
+from spackter_api import (
+    AmbiguousStackError,
+    StackExistsError,
+    StackNotFoundError,
+    get_stack,
+    register_stack,
+)
+from spackter_trace import trace_span, traced
+from spackter_trash import move_to_trash, purge_in_background
+from spackter_util import (
+    get_base_cmd,
+    get_spackter_root,
+    read_spack_config,
+    run_spack_python,
+    warm_spack_caches,
+)
+from typing_extensions import Annotated
+
+# An exported spack stack is a compressed tar stream of the spack root directory
+# (spack checkout, 'etc/spack' configs and install tree) and the ENTRY_FILE
+# with the spackter database entry and the paths the stack was exported from.
+ENTRY_FILE = "spackter-entry.yaml"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Rewrites the old spack root in all files below the new spack root with spack's own
+# relocation. Binaries can only be relocated into a prefix that is not longer than the old one.
+# Only the spack root is relocated: paths below the old SPACKTER_ROOT outside of it (the
+# shared compiler tree, caches and ccache) are kept in the configs, env.sh and binaries alike.
+RELOCATE_SCRIPT = """
+import json
+import os
+import stat
+import spack.relocate
+old = os.environ["SPACKTER_OLD_ROOT"]
+new = os.environ["SPACKTER_NEW_ROOT"]
+mapping = {old: new}
+skip = {os.path.join(new, ".git"), os.path.join(new, "cache")}
+text, binaries, links, failed, readonly = [], [], 0, [], []
+for root, dirs, files in os.walk(new):
+    dirs[:] = [d for d in dirs if os.path.join(root, d) not in skip]
+    regular = set(files)
+    for name in dirs + files:
+        path = os.path.join(root, name)
+        if os.path.islink(path):
+            target = os.readlink(path)
+            if target.startswith(old):
+                os.unlink(path)
+                os.symlink(new + target[len(old):], path)
+                links += 1
+            continue
+        if name not in regular:
+            continue
+        mode = os.lstat(path).st_mode
+        if not mode & stat.S_IWUSR:
+            os.chmod(path, mode | stat.S_IWUSR)
+            readonly.append((path, mode))
+        with open(path, "rb") as file:
+            head = file.read(4096)
+        (binaries if head.startswith(b"\\x7fELF") or b"\\0" in head else text).append(path)
+spack.relocate.relocate_text(text, mapping)
+for path in binaries:
+    try:
+        spack.relocate.relocate_text_bin([path], mapping)
+    except Exception:
+        failed.append(path)
+for path, mode in readonly:
+    os.chmod(path, stat.S_IMODE(mode))
+print(json.dumps({"text": len(text), "binaries": len(binaries), "links": links, "failed": failed}))
+"""
+
+INSTALL_TREE_SCRIPT = """
+import json
+import spack.store
+print(json.dumps(spack.store.STORE.root))
+"""
+
+
+def export(
+    name: Annotated[
+        str,
+        typer.Argument(
+            help="""
+        Name of spack stack, or ID of spack stack if '--id' option is given.
+        """
+        ),
+    ],
+    file: Annotated[
+        Path,
+        typer.Argument(
+            help="""
+        Archive to write. Compressed with multi-threaded zstd if available,
+        with pigz or gzip if not or if the file name ends with '.gz' or '.tgz'.
+        """
+        ),
+    ],
+    id: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--id",
+            help="""
+        ID of spack stack. Needed if two stack with same name exist at different prefixes.
+        """,
+        ),
+    ] = False,
+):
+    try:
+        stack = get_stack(name, id)
+    except StackNotFoundError as e:
+        print(f"===> {e}")
+        print("===> Aborting.")
+        raise typer.Exit(code=1)
+    except AmbiguousStackError:
+        print(f"===> There are multiple spack stacks with the name '{name}'.")
+        print("===> Use 'spackter export <id> --id' to specify the intended spack stack.")
+        print("===> Aborting.")
+        raise typer.Exit(code=1)
+
+    if stack["type"] != "SPACKTER":
+        print("===> Error: Only spack stacks created by spackter can be exported.")
+        raise typer.Exit(code=1)
+    spack_root = Path(stack["spack_root"])
+    check_install_tree(spack_root)
+    if read_spack_config(spack_root / "etc/spack/upstreams.yaml").get("upstreams"):
+        print("===> Warning: The spack stack uses upstream install trees (e.g. the shared compiler tree).")
+        print("===> They are not exported and have to exist at the same location after the import.")
+
+    file = file.expanduser().resolve()
+    compressor = get_compressor(file)
+    entry = {
+        "spackter_root": get_spackter_root().resolve().as_posix(),
+        "spack_root": spack_root.as_posix(),
+        "entry": {key: value for key, value in stack.items() if key != "spack_root"},
+    }
+    with tempfile.TemporaryDirectory(prefix=".spackter-export-") as tmp_dir:
+        with open(Path(tmp_dir) / ENTRY_FILE, "w") as entry_file:
+            entry_file.write(yaml.safe_dump(entry))
+        # The spack user cache only holds indices that spack rebuilds on demand
+        tar_cmd = ["tar", "-cf", "-", "-C", tmp_dir, ENTRY_FILE]
+        tar_cmd += ["-C", spack_root.parent.as_posix(), f"--exclude={spack_root.name}/cache"]
+        tar_cmd += [f"--exclude={spack_root.name}/share/spack/.spackter-*-staging", spack_root.name]
+        print(f"===> Exporting '{stack['name']}' to: {file}")
+        with open(file, "wb") as archive:
+            if not run_pipeline(tar_cmd, compressor, stdout=archive):
+                file.unlink()
+                print("===> Aborting.")
+                raise typer.Exit(code=1)
+    print(f"===> Exported '{stack['name']}' ({file.stat().st_size / 1024**3:.1f} GiB).")
+
+
+def import_(
+    file: Annotated[
+        Path,
+        typer.Argument(
+            help="""
+        Archive written by 'spackter export'.
+        """
+        ),
+    ],
+    prefix: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--prefix",
+            help="""
+        Install prefix path for the imported spack stack. Defaults to 'SPACKTER_ROOT/spack'
+        """,
+            show_default=False,
+        ),
+    ] = None,
+):
+    file = file.expanduser().resolve()
+    if not file.exists():
+        print(f"===> Error: Could not find archive: {file}")
+        raise typer.Exit(code=1)
+    if not prefix:
+        prefix = get_spackter_root() / "spack"
+        print(f"===> Using default prefix: {prefix}")
+    prefix = prefix.expanduser().resolve()
+    prefix.mkdir(parents=True, exist_ok=True)
+
+    # Unpack next to the final location, so moving the stack into place is a rename
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".spackter-import-", dir=prefix))
+    try:
+        print(f"===> Unpacking '{file}' into: {prefix}")
+        if not run_pipeline(get_decompressor(file), ["tar", "-xf", "-", "-C", tmp_dir.as_posix()]):
+            print("===> Aborting.")
+            raise typer.Exit(code=1)
+        if not (tmp_dir / ENTRY_FILE).exists():
+            print(f"===> Error: '{file}' is not an archive written by 'spackter export'.")
+            print(f"===> It does not contain a '{ENTRY_FILE}' file.")
+            raise typer.Exit(code=1)
+        with open(tmp_dir / ENTRY_FILE, "r") as entry_file:
+            exported = yaml.safe_load(entry_file.read())
+
+        old_root = Path(exported["spack_root"])
+        spack_root = prefix / old_root.name
+        if spack_root.exists():
+            print(f"===> Error: There already exists a directory at: {spack_root}")
+            print("===> Use '--prefix' to import the spack stack somewhere else.")
+            raise typer.Exit(code=1)
+        os.rename(tmp_dir / old_root.name, spack_root)
+    finally:
+        purge_in_background(move_to_trash(tmp_dir))
+
+    if spack_root != old_root:
+        try:
+            relocate_stack(spack_root, old_root)
+        except (Exception, KeyboardInterrupt):
+            # A partially relocated stack still points to the old prefix and is not registered
+            print(f"===> Removing the partially imported spack stack at: {spack_root}")
+            purge_in_background(move_to_trash(spack_root))
+            raise
+    # The spack user cache is not exported
+    warm_spack_caches(get_base_cmd(spack_root))
+
+    if Path(exported["spackter_root"]) != get_spackter_root().resolve():
+        print(f"===> The spack stack still uses the shared compiler tree and caches below: {exported['spackter_root']}")
+
+    spackter_entry = relocate_paths(exported["entry"], old_root, spack_root)
+    spackter_entry["prefix"] = prefix.as_posix()
+    try:
+        spackter_entry = register_stack(spack_root, spackter_entry)
+    except StackExistsError as e:
+        print(f"===> Error: {e}")
+        raise typer.Exit(code=1)
+    print(f"===> Imported '{spackter_entry['name']}' with ID {spackter_entry['id']}.")
+    print(f"===> Run 'spackter verify {spackter_entry['id']} --id' to check the spack stack.")
+
+
+def check_install_tree(spack_root: Path):
+    install_tree, result = run_spack_python(get_base_cmd(spack_root), INSTALL_TREE_SCRIPT)
+    if install_tree is None:
+        print("===> Error: Could not determine the install tree of the spack stack.")
+        print(result.stderr)
+        raise typer.Exit(code=1)
+    install_tree = Path(install_tree).resolve()
+    if not install_tree.is_relative_to(spack_root.resolve()):
+        print(f"===> Error: The install tree '{install_tree}' is outside of the spack stack.")
+        print("===> Only spack stacks with their install tree inside the spack root can be exported.")
+        raise typer.Exit(code=1)
+
+
+def get_compressor(file: Path) -> list[str]:
+    if not file.name.endswith((".gz", ".tgz")):
+        if shutil.which("zstd"):
+            return ["zstd", "-T0", "-q", "-c"]
+        if file.name.endswith((".zst", ".tzst")):
+            print("===> Error: 'zstd' is not available. Use a '.tar.gz' file name instead.")
+            raise typer.Exit(code=1)
+    if shutil.which("pigz"):
+        return ["pigz", "-c"]
+    return ["gzip", "-c"]
+
+
+def get_decompressor(file: Path) -> list[str]:
+    with open(file, "rb") as archive:
+        magic = archive.read(4)
+    if magic.startswith(ZSTD_MAGIC):
+        return ["zstd", "-d", "-q", "-c", file.as_posix()]
+    if magic.startswith(GZIP_MAGIC):
+        return ["pigz" if shutil.which("pigz") else "gzip", "-d", "-c", file.as_posix()]
+    print(f"===> Error: '{file}' is not a zstd or gzip compressed archive.")
+    raise typer.Exit(code=1)
+
+
+def run_pipeline(producer_cmd: list[str], consumer_cmd: list[str], stdout=None) -> bool:
+    cmd = f"{' '.join(producer_cmd)} | {' '.join(consumer_cmd)}"
+    print("===> Running commands:")
+    print(f"  $ {cmd}")
+    with trace_span(f"{producer_cmd[0]} | {consumer_cmd[0]}", "subprocess", cmd=cmd) as span:
+        producer = subprocess.Popen(producer_cmd, stdout=subprocess.PIPE)
+        consumer = subprocess.Popen(consumer_cmd, stdin=producer.stdout, stdout=stdout)
+        # Only the consumer may hold the pipe, so the producer gets SIGPIPE if it exits
+        producer.stdout.close()
+        span["exit_code"] = consumer.wait() or producer.wait()
+    if span["exit_code"]:
+        print(f"===> Error: {cmd} failed with return code {span['exit_code']}")
+        return False
+    return True
+
+
+@traced
+def relocate_paths(value, old_root: Path, spack_root: Path):
+    # Rewrites all paths below the old spack root in the database entry (env script, view, ...)
+    if isinstance(value, dict):
+        return {key: relocate_paths(item, old_root, spack_root) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(relocate_paths(item, old_root, spack_root) for item in value)
+    if isinstance(value, str) and Path(value).is_relative_to(old_root):
+        return (spack_root / Path(value).relative_to(old_root)).as_posix()
+    return value
+
+
+def relocate_stack(spack_root: Path, old_root: Path):
+    print(f"===> Relocating spack stack from '{old_root}' to: {spack_root}")
+    if len(spack_root.as_posix()) > len(old_root.as_posix()):
+        print("===> Warning: The new prefix is longer than the old one.")
+        print("===> Binaries that contain the old prefix can not be relocated.")
+
+    # spack has to find its install tree before it can relocate it
+    for config_file in (spack_root / "etc/spack").glob("*.yaml"):
+        config = config_file.read_text()
+        config_file.write_text(config.replace(old_root.as_posix(), spack_root.as_posix()))
+
+    relocated, result = run_spack_python(
+        get_base_cmd(spack_root),
+        RELOCATE_SCRIPT,
+        SPACKTER_OLD_ROOT=old_root.as_posix(),
+        SPACKTER_NEW_ROOT=spack_root.as_posix(),
+    )
+    if relocated is None:
+        print("===> Error: Relocation of the spack stack failed.")
+        print(result.stderr)
+        raise typer.Exit(code=1)
+    print(
+        f"===> Relocated {relocated['text']} text files, {relocated['binaries']} binaries "
+        f"and {relocated['links']} symlinks."
+    )
+    if relocated["failed"]:
+        print(f"===> Error: Could not relocate {len(relocated['failed'])} binaries, e.g.:")
+        for path in relocated["failed"][:10]:
+            print(f"  {path}")
+        print("===> Import into a prefix that is not longer than the old one, or use")
+        print("===> 'config:install_tree:padded_length' in the exported spack stack.")
+        raise typer.Exit(code=1)
@@ -5,8 +5,11 @@ from rich.table import Table
 from rich.align import Align
 
 from globals import console
-from spackter_util import read_stacks_file
-from spackter_util import select_stack
+from spackter_api import AmbiguousStackError
+from spackter_api import get_stack
+from spackter_api import list_stacks
+from spackter_api import StackNotFoundError
+from spackter_ccache import format_hit_rate
 
 def list(
     name: Annotated[Optional[str],
@@ -24,42 +27,32 @@ def list(
     if not name:
         print_compact_list()
     else:
-        selected = select_stack(name, id)
-        if not selected:
-            if id:
-                print(f"===> Could not find a spack stack with the id '{name}'.")
-            else:
-                print(f"===> Could not find a spack stack with the name '{name}'.")
+        try:
+            spackter_entry = get_stack(name, id)
+        except StackNotFoundError as e:
+            print(f"===> {e}")
             print("===> Aborting.")
             raise typer.Exit(code=1)
-        elif len(selected) > 1:
+        except AmbiguousStackError:
             print(f"===> There are multiple spack stacks with the name '{name}':")
             print_compact_list(only_name=name)
             print("===> Use 'spackter list <id> --id' to specify the intended spack stack.")
             print(f"===> Aborting.")
             raise typer.Exit(code=1)
-        else:
-            spackter_entry = selected[0][1]
-            print_create_summary(spackter_entry)
+        print_create_summary(spackter_entry)
 
 
 def print_compact_list(only_name: Optional[str] = None):
-    stacks = read_stacks_file()
     table = Table("NAME", "ID", "COMPILER", "CONFIGS", "SPACK VERSION", "TYPE", "CREATED")
-    for entry in stacks:
-        if not entry == "data":
-            name = stacks[entry]["name"]
-            id = stacks[entry]["id"]
-            compiler = stacks[entry]["compiler"] if stacks[entry]["compiler"] else "system"
-            configs =  stacks[entry]["configs"]
-            spack_version =  stacks[entry]["spack_version"].split(" ")[0]
-            type =  stacks[entry]["type"]
-            created = stacks[entry]["created"]
-            if only_name:
-                if only_name == name:
-                    table.add_row(name, f"{id}", compiler, configs, spack_version, type, created)
-            else:
-                table.add_row(name, f"{id}", compiler, configs, spack_version, type, created)
+    for stack in list_stacks(only_name):
+        name = stack["name"]
+        id = stack["id"]
+        compiler = stack["compiler"] if stack["compiler"] else "system"
+        configs = stack["configs"]
+        spack_version = stack["spack_version"].split(" ")[0]
+        type = stack["type"]
+        created = stack["created"]
+        table.add_row(name, f"{id}", compiler, configs, spack_version, type, created)
     console.print(table)
 
 
@@ -79,6 +72,11 @@ def print_create_summary(spackter_entry: dict):
     else:
         t1.add_row("Compiler", "System")
     t1.add_row("Spack version", spackter_entry['spack_version'])
+    if spackter_entry.get("view"):
+        t1.add_row("View", spackter_entry['view'])
+    if spackter_entry.get("ccache"):
+        ccache = spackter_entry['ccache']
+        t1.add_row("ccache hit rate", format_hit_rate(ccache['hits'], ccache['misses']))
     for patch in spackter_entry['patches']: 
         status = "SUCCESS" if patch[1] else "FAILED"
         t2.add_row(patch[0], status)
@@ -87,9 +85,14 @@ def print_create_summary(spackter_entry: dict):
         t3.add_row(pr[0], status)
     for pkg in spackter_entry['packages']:
         status = "SUCCESS" if pkg[1] else "FAILED"
-        t4.add_row(pkg[0], status)
+        if len(pkg) > 2:
+            t4.add_row(pkg[0], status, format_duration(pkg[2]))
+        else:
+            t4.add_row(pkg[0], status)
     status = "SUCCESS" if spackter_entry['post_install']['success'] else "FAILED"
     t5.add_row("Post install script", status)
+    for index, seconds in spackter_entry.get('warm_caches', {}).items():
+        t5.add_row(f"Spack {index}", f"{seconds}s")
 
     table.add_row(Align(t1, align="center"))
     table.add_row(Align(t2, align="center"))
@@ -97,3 +100,50 @@ def print_create_summary(spackter_entry: dict):
     table.add_row(Align(t4, align="center"))
     table.add_row(Align(t5, align="center"))
     console.print(table)
+
+
+def format_duration(seconds: int) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h {minutes:02d}m {seconds:02d}s"
+
+
+def print_plan_summary(spackter_plan: dict):
+    table = Table("Spackter plan summary")
+    t1 = Table(show_header=False)
+    t2 = Table(title="Patches", show_header=False)
+    t3 = Table(title="Pull Requests", show_header=False)
+    t4 = Table("PACKAGE", "STATUS", "INSTALLED", "UPSTREAM", "EXTERNAL", "BUILDCACHE", "SOURCE", "ESTIMATE",
+               title="Packages")
+
+    t1.add_row("Name", spackter_plan['name'])
+    t1.add_row("Location", spackter_plan['location'])
+    for patch in spackter_plan['patches']:
+        status = "APPLIES" if patch[1] else "FAILS"
+        t2.add_row(patch[0], status)
+    for pr in spackter_plan['pull_requests']:
+        status = "APPLIES" if pr[1] else "FAILS"
+        t3.add_row(pr[0], status)
+
+    total = 0
+    unknown = 0
+    for pkg in spackter_plan['packages']:
+        nodes = pkg['nodes']
+        if pkg['estimate'] is None:
+            estimate = "unknown"
+            unknown += 1
+        else:
+            estimate = format_duration(pkg['estimate'])
+            total += pkg['estimate']
+        t4.add_row(pkg['package'], pkg['status'].upper(), f"{nodes['installed']}", f"{nodes['upstream']}",
+                   f"{nodes['external']}", f"{nodes['buildcache']}", f"{nodes['source']}", estimate)
+    estimate = format_duration(total)
+    if unknown:
+        estimate += f" (+ {unknown} packages without build history)"
+    t1.add_row("Estimated build time", estimate)
+
+    table.add_row(Align(t1, align="center"))
+    table.add_row(Align(t2, align="center"))
+    table.add_row(Align(t3, align="center"))
+    table.add_row(Align(t4, align="center"))
+    console.print(table)
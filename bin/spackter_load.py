@@ -2,8 +2,9 @@ import typer
 from typing import Optional
 from typing_extensions import Annotated
 
-from spackter_util import select_stack
-from spackter_list import print_compact_list
+from spackter_api import AmbiguousStackError
+from spackter_api import get_stack
+from spackter_api import StackNotFoundError
 
 def load(
     name: Annotated[str, 
@@ -25,24 +26,23 @@ def load(
         Should be used to load a stack from inside a script.
         """)] = False
 ):
-    selected = select_stack(name, id)
-    if not selected:
-        if id:
-            print(f"===> Could not find a spack stack with the id '{name}'.")
-        else:
-            print(f"===> Could not find a spack stack with the name '{name}'.")
+    try:
+        stack = get_stack(name, id)
+    except StackNotFoundError as e:
+        print(f"===> {e}")
         print("===> Aborting.")
         raise typer.Exit(code=1)
-    elif len(selected) > 1:
+    except AmbiguousStackError:
+        from spackter_list import print_compact_list
+
         print(f"===> There are multiple spack stacks with the name '{name}':")
         print_compact_list(only_name=name)
         print("===> Use 'spackter load <id> --id' to specify the intended spack stack.")
         print(f"===> Aborting.")
         raise typer.Exit(code=1)
+
+    if not only_env_script:
+        print(f"===> Loading spack stack: {stack['name']} (ID {stack['id']})")
+        print(f"===> Using this environment script: {stack['env_script']}")
     else:
-        stack = selected[0][1]
-        if not only_env_script:
-            print(f"===> Loading spack stack: {stack['name']} (ID {stack['id']})")
-            print(f"===> Using this environment script: {stack['env_script']}")
-        else:
-            print(f"{stack['env_script']}")
+        print(f"{stack['env_script']}")
@@ -0,0 +1,150 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import yaml
+from spackter_trace import traced
+from spackter_util import run_shell_cmd, run_spack_python
+
+# Default module roots of spack if 'modules:default:roots' is not set
+DEFAULT_MODULE_ROOTS = {
+    "tcl": "$spack/share/spack/modules",
+    "lmod": "$spack/share/spack/lmod",
+}
+REFRESH_BATCH_SIZE = 200
+MODULE_INDEX = "module-index.yaml"
+# Files listing the modules hidden by 'hide_implicits', of tcl and lmod
+MODULERC_FILES = {".modulerc", "modulerc.lua"}
+
+# Installed specs that were not regenerated but depend on one of the new specs.
+# Their autoload lists can change when a dependency is (re)installed.
+DEPENDENTS_SCRIPT = """
+import json
+import os
+import spack.store
+new = set(os.environ["SPACKTER_NEW_SPECS"].split())
+dependents = []
+with spack.store.STORE.db.read_transaction():
+    for spec in spack.store.STORE.db.query_local(installed=True):
+        if spec.dag_hash() not in new and any(d.dag_hash() in new for d in spec.dependencies()):
+            dependents.append(spec.dag_hash())
+print(json.dumps(dependents))
+"""
+
+
+def get_installed_hashes(base_cmd: str) -> set[str]:
+    cmd = base_cmd + 'spack find --format "{hash}";'
+    result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+    if result.returncode:
+        return set()
+    return set(result.stdout.split())
+
+
+def get_installed_dependents(base_cmd: str, hashes: set[str]) -> set[str]:
+    dependents, _ = run_spack_python(base_cmd, DEPENDENTS_SCRIPT, SPACKTER_NEW_SPECS=" ".join(hashes))
+    if dependents is None:
+        print("===> Warning: Could not determine the dependents of the new packages.")
+        return set()
+    return set(dependents)
+
+
+def get_module_roots(base_cmd: str, spack_root: Path) -> dict[str, Path]:
+    cmd = base_cmd + "spack config get modules;"
+    result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+    modules = (yaml.safe_load(result.stdout) or {}).get("modules", {})
+    default = modules.get("default") or {}
+    roots = default.get("roots") or {}
+    module_roots = {}
+    for module_type in default.get("enable") or []:
+        root = roots.get(module_type, DEFAULT_MODULE_ROOTS.get(module_type))
+        if root:
+            root = root.replace("${spack}", spack_root.as_posix())
+            root = root.replace("$spack", spack_root.as_posix())
+            module_roots[module_type] = Path(root).expanduser()
+    return module_roots
+
+
+def merge_module_index(staged: Path, target: Path, staging_dir: Path, module_root: Path):
+    # The staged index only knows the regenerated specs, and with paths inside the staging root
+    index = {}
+    if target.exists():
+        with open(target, "r") as file:
+            index = (yaml.safe_load(file.read()) or {}).get("module_index") or {}
+    with open(staged, "r") as file:
+        staged_index = (yaml.safe_load(file.read()) or {}).get("module_index") or {}
+    for hash, entry in staged_index.items():
+        entry["path"] = entry["path"].replace(staging_dir.as_posix(), module_root.as_posix(), 1)
+        index[hash] = entry
+    tmp_target = target.with_name(f".{target.name}.spackter-tmp")
+    with open(tmp_target, "w") as file:
+        file.write(yaml.safe_dump({"module_index": index}))
+    os.replace(tmp_target, target)
+
+
+def seed_modulerc_files(module_root: Path, staging_dir: Path) -> list[Path]:
+    # spack adds the regenerated modules to, or removes them from, the hidden modules of an
+    # existing modulerc, so it has to start from the current ones and not from an empty file
+    seeded = []
+    for root, _, filenames in os.walk(module_root):
+        for filename in MODULERC_FILES.intersection(filenames):
+            relative = (Path(root) / filename).relative_to(module_root)
+            (staging_dir / relative).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(module_root / relative, staging_dir / relative)
+            seeded.append(relative)
+    return seeded
+
+
+def install_module_files(staging_dir: Path, module_root: Path, seeded: list[Path]) -> int:
+    count = 0
+    for root, _, filenames in os.walk(staging_dir):
+        for filename in filenames:
+            staged = Path(root) / filename
+            target = module_root / staged.relative_to(staging_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if filename == MODULE_INDEX:
+                merge_module_index(staged, target, staging_dir, module_root)
+                continue
+            # Copy next to the target first, so the rename is atomic even across filesystems
+            tmp_target = target.with_name(f".{target.name}.spackter-tmp")
+            shutil.copy2(staged, tmp_target)
+            os.replace(tmp_target, target)
+            if filename not in MODULERC_FILES:
+                count += 1
+    # spack deletes a modulerc once it hides no module anymore
+    for relative in seeded:
+        if not (staging_dir / relative).exists():
+            (module_root / relative).unlink(missing_ok=True)
+    return count
+
+
+@traced
+def refresh_modules(base_cmd: str, spack_root: Path, hashes: set[str]) -> int:
+    if not hashes:
+        print("===> No new packages, module files are up to date.")
+        return 0
+
+    hashes = hashes | get_installed_dependents(base_cmd, hashes)
+    module_roots = get_module_roots(base_cmd, spack_root)
+    if not module_roots:
+        print("===> No module types enabled in 'modules.yaml'. Skipping module generation.")
+        return 0
+
+    count = 0
+    specs = sorted(f"/{hash}" for hash in hashes)
+    for module_type, module_root in module_roots.items():
+        print(f"===> Generating {module_type} module files for {len(specs)} packages in: {module_root}")
+        # spack writes into a staging root, finished files are then moved into the real
+        # module tree one by one, so the existing module files stay usable the whole time
+        staging_dir = spack_root / f"share/spack/.spackter-{module_type}-staging"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        seeded = seed_modulerc_files(module_root, staging_dir)
+        for i in range(0, len(specs), REFRESH_BATCH_SIZE):
+            cmd = base_cmd + f"spack -c modules:default:roots:{module_type}:{staging_dir} "
+            cmd += f"module {module_type} refresh --yes-to-all {' '.join(specs[i:i + REFRESH_BATCH_SIZE])};"
+            run_shell_cmd(cmd, print_cmd=False, error_exit=False)
+        if staging_dir.exists():
+            count += install_module_files(staging_dir, module_root, seeded)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    print(f"===> Updated {count} module files.")
+    return count
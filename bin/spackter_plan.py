@@ -0,0 +1,202 @@
+import re
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import typer
+from spackter_api import list_stacks
+from spackter_bootstrap import configure_bootstrap
+from spackter_cache import configure_source_cache
+from spackter_compilers import find_compiler, get_compiler_install_tree, use_compiler
+from spackter_create import (
+    clone_spack,
+    concretize_packages,
+    copy_config_files,
+    handle_patches,
+    handle_prs,
+)
+from spackter_list import print_plan_summary
+from spackter_trash import purge_in_background
+from spackter_util import get_base_cmd, get_spack_version, get_spackter_root
+from typing_extensions import Annotated
+
+NODE_STATUS = {
+    "[+]": "installed",
+    "[^]": "upstream",
+    "[e]": "external",
+}
+
+
+def plan(
+    name: Annotated[
+        str, typer.Argument(help="""Name for the spack stack""", show_default=False)
+    ],
+    configs: Annotated[
+        str,
+        typer.Option(
+            help="""
+        Name of configs directory inside 'SPACKTER_ROOT/configs'
+        """
+        ),
+    ] = "default",
+    prefix: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="""
+        Install prefix path for this spack stack. Defaults to 'SPACKTER_ROOT/spack'
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    compiler: Annotated[
+        Optional[str],
+        typer.Option(
+            help="""
+        Specify compiler that spack will build and use for packages.
+        Defaults to first system compiler that spack finds
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    spack_branch: Annotated[
+        Optional[str],
+        typer.Option(
+            "--spack_branch",
+            help="""
+        Will use the given spack branch for stack creation.
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    spack_commit: Annotated[
+        Optional[str],
+        typer.Option(
+            "--spack_commit",
+            help="""
+        Will use the given spack commit for stack creation.
+        """,
+            show_default=False,
+        ),
+    ] = None,
+):
+    spackter_root = get_spackter_root()
+
+    spackter_config_dir = spackter_root / "configs" / configs
+    if not spackter_config_dir.exists():
+        print(
+            f"===> Error: Spackter configs dir does not exist at: {spackter_config_dir}"
+        )
+        print("===> Aborting.")
+        raise typer.Exit(code=1)
+
+    if not prefix:
+        prefix = spackter_root / "spack"
+    else:
+        prefix = prefix.expanduser().resolve()
+
+    if spack_branch and spack_commit:
+        print("===> --spack-branch and --spack-commit can not both be set.")
+        print("===> Exiting.")
+        raise typer.Exit(code=1)
+
+    if (prefix / name).exists():
+        print(f"===> Warning: {prefix / name} already exists and would be overwritten.")
+
+    # All steps run in a scratch spack checkout that is deleted afterwards,
+    # so the planned prefix and the spackter database stay untouched
+    prefix.mkdir(parents=True, exist_ok=True)
+    scratch_dir = Path(tempfile.mkdtemp(prefix=".spackter-plan-", dir=prefix))
+    spack_root = scratch_dir / name
+    try:
+        spack_repo = clone_spack(scratch_dir, spack_root, spack_branch, spack_commit)
+        spackter_plan = {}
+        spackter_plan["name"] = name
+        spackter_plan["location"] = (prefix / name).as_posix()
+        spackter_plan["patches"] = handle_patches(
+            spackter_config_dir, spack_repo, {}, dry_run=True
+        )
+        spackter_plan["pull_requests"] = handle_prs(
+            spackter_config_dir, spack_repo, {}, dry_run=True
+        )
+        copy_config_files(spack_root, spackter_config_dir)
+        configure_source_cache(spack_root, spackter_config_dir)
+
+        base_cmd = get_base_cmd(spack_root)
+        configure_bootstrap(spack_root, spackter_config_dir, base_cmd)
+        if compiler:
+            # A compiler that was already built by spackter is used as upstream like in create
+            spack_version = get_spack_version(base_cmd)
+            compiler_prefix = find_compiler(compiler, spack_version)
+            if compiler_prefix:
+                use_compiler(
+                    spack_root,
+                    base_cmd,
+                    compiler_prefix,
+                    get_compiler_install_tree(spack_version),
+                )
+        buildcache_hashes = get_buildcache_hashes(base_cmd)
+        packages = concretize_packages(spackter_config_dir, base_cmd, compiler)
+        spackter_plan["packages"] = [
+            plan_package(package, concretized, nodes, buildcache_hashes)
+            for package, concretized, nodes in packages
+        ]
+    finally:
+        # Not recorded as pending deletion, the spackter database stays untouched
+        purge_in_background(scratch_dir, track=False)
+
+    print_plan_summary(spackter_plan)
+
+
+def get_buildcache_hashes(base_cmd: str) -> set[str]:
+    cmd = base_cmd + "spack buildcache list --allarch --long;"
+    result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+    if result.returncode:
+        return set()
+    return set(re.findall(r"^([a-z0-9]{7})\s", result.stdout, re.MULTILINE))
+
+
+def plan_package(
+    package: str,
+    concretized: bool,
+    nodes: list[tuple[str, str, str]],
+    buildcache_hashes: set[str],
+) -> dict:
+    planned = {"package": package, "concretized": concretized}
+    counts = {"installed": 0, "upstream": 0, "external": 0, "buildcache": 0, "source": 0}
+    for status, hash, _ in nodes:
+        if status in NODE_STATUS:
+            counts[NODE_STATUS[status]] += 1
+        elif hash in buildcache_hashes:
+            counts["buildcache"] += 1
+        else:
+            counts["source"] += 1
+    planned["nodes"] = counts
+
+    if not concretized:
+        planned["status"] = "FAILED"
+    elif not nodes:
+        planned["status"] = "UNKNOWN"
+    elif nodes[0][0] in NODE_STATUS:
+        planned["status"] = NODE_STATUS[nodes[0][0]]
+    elif nodes[0][1] in buildcache_hashes:
+        planned["status"] = "buildcache"
+    else:
+        planned["status"] = "source"
+
+    planned["estimate"] = (
+        estimate_build_time(package) if planned["status"] == "source" else 0
+    )
+    return planned
+
+
+def estimate_build_time(package: str) -> Optional[int]:
+    durations = []
+    for stack in list_stacks():
+        for pkg in stack["packages"]:
+            # Entries created before build times were recorded only have two fields
+            if len(pkg) > 2 and pkg[0] == package and pkg[1]:
+                durations.append(pkg[2])
+    if not durations:
+        return None
+    return round(sum(durations) / len(durations))
@@ -0,0 +1,78 @@
+import atexit
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Chrome/Perfetto trace events of the current spackter run, None while tracing is disabled.
+# See https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+_events = None
+
+
+def start_trace(trace_file: Path, name: str):
+    global _events
+    _events = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": os.getpid(),
+            "args": {"name": name},
+        }
+    ]
+    # Written at exit, so aborted runs are traced as well
+    atexit.register(write_trace, trace_file)
+
+
+def write_trace(trace_file: Path):
+    if _events is None:
+        return
+    import json
+
+    with open(trace_file, "w") as file:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms"}, file)
+    print(f"===> Trace written to: {trace_file}")
+
+
+def now() -> int:
+    return time.time_ns() // 1000
+
+
+@contextmanager
+def trace_span(name: str, category: str, **args):
+    if _events is None:
+        yield args
+        return
+    start = now()
+    try:
+        # The caller can add results like the exit code to the yielded args
+        yield args
+    finally:
+        _events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": now() - start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def command_name(cmd: str) -> str:
+    # The last command is the interesting one, the ones before only set up spack
+    commands = [command.strip() for command in cmd.split(";") if command.strip()]
+    return commands[-1] if commands else cmd
+
+
+def traced(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with trace_span(func.__name__, "phase"):
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,157 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from spackter_util import read_stacks_file, update_stacks_file
+
+# Name of the trash directory that is created next to the deleted spack stacks.
+# It has to live on the same filesystem so that moving a stack into it is a rename.
+TRASH_DIR_NAME = ".spackter-trash"
+UNLINK_BATCH_SIZE = 1000
+UNLINK_WORKERS = 16
+
+
+def move_to_trash(spack_root: Path) -> Path:
+    trash_root = spack_root.parent / TRASH_DIR_NAME
+    trash_root.mkdir(exist_ok=True)
+    trash_path = trash_root / f"{spack_root.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    os.rename(spack_root, trash_path)
+    set_pending_deletion(trash_path, None)
+    return trash_path
+
+
+def set_pending_deletion(trash_path: Path, pid: Optional[int]):
+    with update_stacks_file() as stacks:
+        stacks["data"].setdefault("trash", {})
+        stacks["data"]["trash"][trash_path.as_posix()] = pid
+
+
+def clear_pending_deletion(trash_path: Path):
+    if trash_path.as_posix() not in get_pending_deletions():
+        return
+    with update_stacks_file() as stacks:
+        stacks["data"].get("trash", {}).pop(trash_path.as_posix(), None)
+
+
+def get_pending_deletions() -> dict[str, Optional[int]]:
+    stacks = read_stacks_file()
+    if stacks:
+        return stacks["data"].get("trash", {})
+    return {}
+
+
+def process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def purge_in_background(trash_path: Path, track: bool = True):
+    # Detach from the current session so the deletion survives the end of the CLI call.
+    # Untracked deletions (e.g. scratch dirs) are not resumed if they get interrupted.
+    proc = subprocess.Popen(
+        [sys.executable, Path(__file__).resolve().as_posix(), trash_path.as_posix()],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    if track:
+        set_pending_deletion(trash_path, proc.pid)
+    return proc.pid
+
+
+def resume_pending_deletions(wait: bool = False):
+    for path, pid in get_pending_deletions().items():
+        trash_path = Path(path)
+        if process_alive(pid):
+            continue
+        if not trash_path.exists():
+            clear_pending_deletion(trash_path)
+            continue
+        print(f"===> Resuming interrupted deletion of: {trash_path}")
+        if wait:
+            purge(trash_path, show_progress=True)
+        else:
+            purge_in_background(trash_path)
+
+
+def unlink_batch(paths: list[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def purge(trash_path: Path, show_progress: bool = False, record_pid: bool = True):
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+
+    # A background purge was already recorded with its pid by purge_in_background
+    if record_pid:
+        set_pending_deletion(trash_path, os.getpid())
+    dirs = []
+    futures = []
+    batch = []
+    with ThreadPoolExecutor(max_workers=UNLINK_WORKERS) as pool, Progress(
+        SpinnerColumn(),
+        TextColumn("===> Deleting {task.fields[path]}: {task.completed} files removed"),
+        TimeElapsedColumn(),
+        disable=not show_progress,
+    ) as progress:
+        task = progress.add_task("delete", total=None, path=trash_path.name)
+        for root, dirnames, filenames in os.walk(trash_path):
+            dirs.append(root)
+            for dirname in dirnames:
+                # os.walk does not descend into symlinked directories, they are removed like files
+                if os.path.islink(os.path.join(root, dirname)):
+                    filenames.append(dirname)
+            for filename in filenames:
+                batch.append(os.path.join(root, filename))
+                if len(batch) >= UNLINK_BATCH_SIZE:
+                    future = pool.submit(unlink_batch, batch)
+                    future.add_done_callback(lambda f: progress.advance(task, f.result()))
+                    futures.append(future)
+                    batch = []
+        if batch:
+            future = pool.submit(unlink_batch, batch)
+            future.add_done_callback(lambda f: progress.advance(task, f.result()))
+            futures.append(future)
+        for future in futures:
+            future.result()
+
+    # Children are listed after their parents by os.walk
+    for directory in reversed(dirs):
+        try:
+            os.rmdir(directory)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Fall back to the slow path for anything the walker could not handle (e.g. permissions)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if not trash_path.exists():
+        clear_pending_deletion(trash_path)
+        if show_progress:
+            print(f"===> '{trash_path}' deleted.")
+    elif show_progress:
+        print(f"===> Error: Could not fully delete '{trash_path}'.")
+        print("===> The deletion will be retried by the next 'spackter delete'.")
+
+
+if __name__ == "__main__":
+    purge(Path(sys.argv[1]), record_pid=False)
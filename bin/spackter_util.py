@@ -1,9 +1,38 @@
 import typer
 import subprocess
 import os
+import fcntl
+import re
 import yaml
-from typing import Optional
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any
+from globals import __version__
+from spackter_trace import command_name, trace_span, traced
+
+# The database is read by every command, use the much faster libyaml loader if available
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Builds the repository indices that spack otherwise builds on the first 'spack find',
+# 'spack spec' or 'spack list' in the misc cache of a stack, and prints how long each took.
+WARM_CACHES_SCRIPT = """
+import json
+import time
+import spack.repo
+repo = spack.repo.PATH if hasattr(spack.repo, "PATH") else spack.repo.path
+timings = {}
+indices = {
+    "provider index": lambda: repo.provider_index,
+    "tag index": lambda: repo.tag_index,
+    "patch index": lambda: repo.patch_index,
+    "package list": repo.all_package_names,
+}
+for index, build in indices.items():
+    start = time.monotonic()
+    build()
+    timings[index] = round(time.monotonic() - start, 1)
+print(json.dumps(timings))
+"""
 
 
 def run_shell_cmd(cmd: str, print_cmd=True, error_exit=True):
@@ -13,11 +42,14 @@ def run_shell_cmd(cmd: str, print_cmd=True, error_exit=True):
             if command:
                 print(f"  $ {command}")
 
-    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, shell=True) as proc:
+    with trace_span(command_name(cmd), "subprocess", cmd=cmd) as span, \
+            subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, shell=True) as proc:
+        span["pid"] = proc.pid
         if proc.stdout:
             for line in proc.stdout:
                 print(line)
         proc.communicate()
+        span["exit_code"] = proc.returncode
     result = subprocess.CompletedProcess(cmd, proc.returncode)
     if result.returncode:
         print(f"===> Error: {result.args} failed with return code {result.returncode}")
@@ -38,48 +70,165 @@ def get_spackter_root():
     return Path(spackter_root)
 
 
-def read_stacks_file():
-    spackter_root = get_spackter_root()
-    spackter_stacks = spackter_root / "data/stacks.yaml"
-    
-    if spackter_stacks.exists():
-        with open(spackter_stacks, "r") as file:
-            return yaml.safe_load(file.read())
-    else:
-        return {}
+def read_yaml_file(path: Path) -> dict:
+    if path.exists():
+        with open(path, "r") as file:
+            return yaml.load(file, Loader=YAML_LOADER) or {}
+    return {}
 
 
-def write_stacks_file(content: dict[str, dict]):
-    spackter_root = get_spackter_root()
-    spackter_data_dir = spackter_root / "data"
-    spackter_stacks = spackter_data_dir / "stacks.yaml"
+def atomic_write_yaml(path: Path, content: dict):
+    # Readers never take a lock, so they must never see a partially written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(tmp_path, "w") as file:
+        file.write(yaml.safe_dump(content))
+    os.replace(tmp_path, path)
 
-    if not spackter_data_dir.exists():
-        spackter_data_dir.mkdir(parents=False, exist_ok=False)
 
-    with open(spackter_stacks, "w") as file:
-        file.write(yaml.safe_dump(content))
+@contextmanager
+def update_yaml_file(path: Path):
+    # Every read-modify-write holds the '<name>.lock' file next to the yaml file, so concurrent
+    # spackter processes (including background deletions) never lose each other's changes.
+    # The content is written when the block ends.
+    with spackter_lock(path.with_suffix(".lock")):
+        content = read_yaml_file(path)
+        yield content
+        atomic_write_yaml(path, content)
+
+
+def read_stacks_file():
+    return read_yaml_file(get_spackter_root() / "data/stacks.yaml")
 
 
-def select_stack(name: str, id: Optional[bool]):
-    spackter_stacks = read_stacks_file()
-    stacks = []
-    if not id:
-        for entry in spackter_stacks:
-            if not entry == "data" and spackter_stacks[entry]["name"] == name:
-                stacks.append((entry, spackter_stacks[entry]))
-    else: 
-        for entry in spackter_stacks:
-            if not entry == "data" and spackter_stacks[entry]["id"] == int(name):
-                stacks.append((entry, spackter_stacks[entry]))
-    return stacks
+@contextmanager
+def update_stacks_file():
+    # The database is created if it does not exist yet
+    with update_yaml_file(get_spackter_root() / "data/stacks.yaml") as stacks:
+        if not stacks:
+            stacks["data"] = {}
+            stacks["data"]["stack_count"] = 0
+            stacks["data"]["id_counter"] = 0
+            stacks["data"]["spackter_version"] = __version__
+        yield stacks
 
 
 def remove_stack(spack_root: Path):
-    stacks = read_stacks_file()
-    if stacks:
+    if spack_root.resolve().as_posix() not in read_stacks_file():
+        return
+    with update_stacks_file() as stacks:
         if stacks.pop(spack_root.resolve().as_posix(), None):
             stacks["data"]["stack_count"] -= 1
-            write_stacks_file(stacks)
 
 
+def read_spack_config(config_file: Path) -> dict:
+    if config_file.exists():
+        with open(config_file, "r") as file:
+            content = yaml.safe_load(file.read())
+            if content:
+                return content
+    return {}
+
+
+def update_spack_config(spack_root: Path, section: str, values: dict):
+    config_file = spack_root / "etc/spack" / f"{section}.yaml"
+    content = read_spack_config(config_file)
+    if not content.get(section):
+        content[section] = {}
+    content[section].update(values)
+    with open(config_file, "w") as file:
+        file.write(yaml.safe_dump(content))
+
+
+@contextmanager
+def spackter_lock(lock_file: Path, shared: bool = False, blocking: bool = True):
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, "a") as file:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def parse_size(size: str) -> int:
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    size = size.strip().upper().removesuffix("B").removesuffix("I")
+    try:
+        if size and size[-1] in units:
+            return int(float(size[:-1]) * units[size[-1]])
+        return int(size)
+    except ValueError:
+        print(f"===> Error: Could not parse size: {size}")
+        raise typer.Exit(code=1)
+
+
+def format_size(size: float) -> str:
+    for unit in ["B", "K", "M", "G"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+def get_spack_version(base_cmd: str) -> str:
+    cmd = base_cmd + "spack --version;"
+    result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+    return result.stdout.strip()
+
+
+def get_spack_version_key(spack_version: str) -> str:
+    # e.g. '1.0.0.dev0 (3a6c8f1)' -> '1.0.0.dev0-3a6c8f1'
+    return re.sub(r"[^A-Za-z0-9.]+", "-", spack_version).strip("-")
+
+
+def get_base_cmd(spack_root: Path) -> str:
+    spack_env_script = spack_root / "share/spack/setup-env.sh"
+    base_cmd = "export SPACK_DISABLE_LOCAL_CONFIG=1;"
+    base_cmd += f"export SPACK_USER_CACHE_PATH={spack_root}/cache;"
+    base_cmd += f". {spack_env_script};"
+    return base_cmd
+
+
+def run_spack_python(base_cmd: str, script: str, **env: str) -> tuple[Any, subprocess.CompletedProcess]:
+    # The script and its inputs are passed through the environment, so they need no shell
+    # quoting. It prints its result as JSON on the last line, spack may print warnings before.
+    # Returns the parsed result, or None if the script failed, and the finished process.
+    import json
+
+    cmd = base_cmd + 'spack python -c "$SPACKTER_PYTHON_SCRIPT";'
+    env = dict(os.environ, SPACKTER_PYTHON_SCRIPT=script, **env)
+    with trace_span("spack python", "subprocess", cmd=cmd) as span, subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=True, env=env
+    ) as proc:
+        span["pid"] = proc.pid
+        stdout, stderr = proc.communicate()
+        span["exit_code"] = proc.returncode
+    result = subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+    if result.returncode:
+        return None, result
+    try:
+        return json.loads(stdout.strip().splitlines()[-1]), result
+    except (IndexError, ValueError):
+        return None, result
+
+
+@traced
+def warm_spack_caches(base_cmd: str) -> dict[str, float]:
+    print("===> Building the spack repository indices in the misc cache.")
+    timings, result = run_spack_python(base_cmd, WARM_CACHES_SCRIPT)
+    if timings is None:
+        # Not fatal, spack builds the indices on first use then
+        print("===> Warning: Could not build the spack repository indices.")
+        print(result.stderr)
+        return {}
+    for index, seconds in timings.items():
+        print(f"===> Built {index} in {seconds}s")
+    return timings
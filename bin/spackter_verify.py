@@ -0,0 +1,257 @@
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import typer
+from globals import console
+from rich.table import Table
+from spackter_api import AmbiguousStackError, StackNotFoundError, get_stack, list_stacks
+from spackter_util import (
+    get_base_cmd,
+    get_spackter_root,
+    read_yaml_file,
+    run_spack_python,
+    update_yaml_file,
+)
+from typing_extensions import Annotated
+
+# Prints the location of the install database, the number of installed packages,
+# the recorded packages that are not installed anymore and the directories whose
+# mtimes change when an install prefix is removed (the prefixes of the recorded
+# packages and the parent directories of all installed prefixes)
+VERIFY_SCRIPT = """
+import json
+import os
+import spack.store
+specs = json.loads(os.environ["SPACKTER_VERIFY_SPECS"])
+db = spack.store.STORE.db
+with db.read_transaction():
+    records = db.query_local(installed=True)
+    matches = {spec: db.query(spec, installed=True) for spec in specs}
+missing = [spec for spec in specs if not any(os.path.isdir(m.prefix) for m in matches[spec])]
+watched = {os.path.dirname(record.prefix) for record in records}
+watched.update(m.prefix for spec in specs for m in matches[spec])
+print(json.dumps({
+    "db_path": db._index_path,
+    "installed": len(records),
+    "missing": missing,
+    "watched": sorted(watched),
+}))
+"""
+
+# Fields that are only needed to validate cached results
+INTERNAL_FIELDS = ["key", "watched"]
+
+
+def verify(
+    name: Annotated[
+        Optional[str],
+        typer.Argument(
+            help="""
+        Name of spack stack, or ID of spack stack if '--id' option is given.
+        """,
+            show_default=False,
+        ),
+    ] = None,
+    id: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--id",
+            help="""
+        ID of spack stack. Needed if two stack with same name exist at different prefixes.
+        """,
+        ),
+    ] = False,
+    all: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--all",
+            help="""
+        Verify all spack stacks in the spackter database.
+        """,
+        ),
+    ] = False,
+    format: Annotated[
+        str,
+        typer.Option(
+            "--format",
+            help="""
+        Output format, 'table' or 'json'.
+        """,
+        ),
+    ] = "table",
+    jobs: Annotated[
+        int,
+        typer.Option(
+            "--jobs",
+            help="""
+        Number of spack stacks that are verified in parallel.
+        """,
+        ),
+    ] = 8,
+    no_cache: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--no-cache",
+            help="""
+        Ignore cached results and verify every spack stack again.
+        """,
+        ),
+    ] = False,
+):
+    if format not in ["table", "json"]:
+        print(f"===> Error: Unknown format: {format}")
+        raise typer.Exit(code=1)
+
+    if all:
+        stacks = list_stacks()
+    elif name:
+        try:
+            stacks = [get_stack(name, id)]
+        except StackNotFoundError as e:
+            print(f"===> {e}")
+            print("===> Aborting.")
+            raise typer.Exit(code=1)
+        except AmbiguousStackError:
+            print(f"===> There are multiple spack stacks with the name '{name}'.")
+            print("===> Use 'spackter verify <id> --id' to specify the intended spack stack.")
+            print("===> Aborting.")
+            raise typer.Exit(code=1)
+    else:
+        print("===> Error: Give the name of a spack stack or use '--all'.")
+        raise typer.Exit(code=1)
+
+    cache = {} if no_cache else read_verify_cache()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(lambda stack: verify_stack(stack, cache), stacks))
+    write_verify_cache({result["spack_root"]: dict(result, cached=False) for result in results})
+
+    if format == "json":
+        output = [
+            {key: value for key, value in result.items() if key not in INTERNAL_FIELDS}
+            for result in results
+        ]
+        print(json.dumps(output, indent=2))
+    else:
+        print_verify_summary(results)
+    if not all_ok(results):
+        raise typer.Exit(code=1)
+
+
+def get_verify_cache_file() -> Path:
+    return get_spackter_root() / "data/verify-cache.yaml"
+
+
+def read_verify_cache() -> dict:
+    return read_yaml_file(get_verify_cache_file())
+
+
+def write_verify_cache(results: dict):
+    with update_yaml_file(get_verify_cache_file()) as cache:
+        cache.update(results)
+
+
+def get_mtime(path: Optional[str]) -> float:
+    try:
+        return os.stat(path).st_mtime if path else 0
+    except OSError:
+        return 0
+
+
+def get_cache_key(stack: dict, db_path: Optional[str], watched: list[str]) -> list:
+    # A result stays valid as long as none of the files it was computed from changed.
+    # Removing an install prefix does not touch the database, but the mtime of its parent.
+    # Config files are edited in place (e.g. by 'spack config add'), which does not change
+    # the mtime of their directory, so every config file is checked itself.
+    spack_root = stack["spack_root"]
+    packages = sorted(pkg[0] for pkg in stack["packages"] if pkg[1])
+    configs = sorted(Path(spack_root, "etc/spack").rglob("*.yaml"))
+    return [
+        get_mtime(stack["env_script"]),
+        get_mtime(f"{spack_root}/share/spack/setup-env.sh"),
+        get_mtime(f"{spack_root}/bin/spack"),
+        get_mtime(f"{spack_root}/etc/spack"),
+        [[config.as_posix(), get_mtime(config.as_posix())] for config in configs],
+        get_mtime(db_path),
+        [get_mtime(path) for path in watched],
+        packages,
+    ]
+
+
+def verify_stack(stack: dict, cache: dict) -> dict:
+    spack_root = stack["spack_root"]
+    cached = cache.get(spack_root)
+    # Only healthy results are reused, broken stacks are always checked again
+    if (
+        cached
+        and stack_ok(cached)
+        and cached["key"] == get_cache_key(stack, cached.get("db_path"), cached.get("watched", []))
+    ):
+        return dict(cached, cached=True)
+
+    result = {
+        "name": stack["name"],
+        "id": stack["id"],
+        "spack_root": spack_root,
+        "env_script": Path(stack["env_script"]).exists(),
+        "spack": False,
+        "database": False,
+        "installed": 0,
+        "missing": [],
+        "db_path": None,
+        "watched": [],
+        "cached": False,
+    }
+    if stack["type"] == "SPACKTER":
+        base_cmd = get_base_cmd(Path(spack_root))
+    else:
+        base_cmd = f". {spack_root}/share/spack/setup-env.sh;"
+
+    cmd = base_cmd + "spack --version;"
+    proc = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+    result["spack"] = proc.returncode == 0
+
+    if result["spack"]:
+        specs = [pkg[0] for pkg in stack["packages"] if pkg[1]]
+        database, _ = run_spack_python(base_cmd, VERIFY_SCRIPT, SPACKTER_VERIFY_SPECS=json.dumps(specs))
+        if database is not None:
+            result["database"] = True
+            result.update(database)
+
+    result["key"] = get_cache_key(stack, result["db_path"], result["watched"])
+    return result
+
+
+def stack_ok(result: dict) -> bool:
+    return result["env_script"] and result["spack"] and result["database"] and not result["missing"]
+
+
+def all_ok(results: list[dict]) -> bool:
+    return all(stack_ok(result) for result in results)
+
+
+def print_verify_summary(results: list[dict]):
+    table = Table("NAME", "ID", "ENV SCRIPT", "SPACK", "DATABASE", "PACKAGES", "STATUS")
+    for result in results:
+        if not result["database"]:
+            packages = "-"
+        elif result["missing"]:
+            packages = "MISSING: " + ", ".join(result["missing"])
+        else:
+            packages = f"{result['installed']} installed"
+        status = "OK" if stack_ok(result) else "BROKEN"
+        if result["cached"]:
+            status += " (cached)"
+        table.add_row(
+            result["name"],
+            f"{result['id']}",
+            "OK" if result["env_script"] else "MISSING",
+            "OK" if result["spack"] else "FAILED",
+            "OK" if result["database"] else "FAILED",
+            packages,
+            status,
+        )
+    console.print(table)
@@ -0,0 +1,100 @@
+import re
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from spackter_trace import traced
+from spackter_util import run_shell_cmd
+
+# The view is created at 'SPACK_ROOT/view' and contains the root packages of the
+# package list with their run dependencies in one prefix.
+VIEW_DIR_NAME = "view"
+VIEW_TYPES = ["symlink", "hardlink"]
+# e.g. 'module load gcc mpich/4.1' or 'module try-load man-db' in the post-script
+MODULE_LOAD = re.compile(r"^\s*module\s+(load|try-load|add)\s+(?P<modules>[^#;&|]+?)\s*$")
+
+
+def get_root_hashes(base_cmd: str, packages: list[tuple], compiler: Optional[str]) -> list[str]:
+    hashes = []
+    for package in packages:
+        if not package[1]:
+            continue
+        cmd = base_cmd + f'spack find --format "{{hash}}" {package[0]}'
+        if compiler:
+            cmd += f" %{compiler}"
+        cmd += ";"
+        result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
+        if result.returncode:
+            print(f"===> Warning: Could not find the installation of {package[0]}.")
+            continue
+        for hash in result.stdout.split():
+            if hash not in hashes:
+                hashes.append(hash)
+    return hashes
+
+
+@traced
+def create_view(
+    base_cmd: str,
+    spack_root: Path,
+    view_type: str,
+    packages: list[tuple],
+    compiler: Optional[str],
+) -> Optional[Path]:
+    view = spack_root / VIEW_DIR_NAME
+    hashes = get_root_hashes(base_cmd, packages, compiler)
+    if not hashes:
+        print("===> No installed packages. Skipping creation of the view.")
+        return None
+
+    print(f"===> Creating {view_type} view of {len(hashes)} packages at: {view}")
+    # Conflicting files of different packages (e.g. two versions of a dependency) are
+    # skipped, the package that is added first wins
+    cmd = base_cmd + f"spack view --dependencies true {view_type} --ignore-conflicts {view} "
+    cmd += " ".join(f"/{hash}" for hash in hashes) + ";"
+    if not run_shell_cmd(cmd, error_exit=False):
+        print("===> Warning: Could not create the view. The env script will not use it.")
+        return None
+    return view
+
+
+def get_view_activation(view: Path) -> str:
+    # Only the view's bin and lib directories are added, instead of one entry per package
+    lib_dirs = [view / lib for lib in ["lib", "lib64"] if (view / lib).is_dir()]
+    activation = "# Filesystem view of the packages of this spack stack\n"
+    activation += f'export PATH="{view}/bin:$PATH"\n'
+    if lib_dirs:
+        lib_path = ":".join(lib_dir.as_posix() for lib_dir in lib_dirs)
+        activation += f'export LD_LIBRARY_PATH="{lib_path}${{LD_LIBRARY_PATH:+:$LD_LIBRARY_PATH}}"\n'
+    return activation
+
+
+def get_view_packages(view: Path) -> set[str]:
+    # spack keeps the metadata of every package linked into the view in 'view/.spack/<name>'
+    metadata = view / ".spack"
+    if not metadata.is_dir():
+        return set()
+    return {package.name for package in metadata.iterdir() if package.is_dir()}
+
+
+def replace_module_loads(post_script: str, view: Path) -> str:
+    # Module loads of packages in the view are replaced by the view activation, loading
+    # them as well would add their prefixes to PATH and LD_LIBRARY_PATH a second time
+    packages = get_view_packages(view)
+    lines = []
+    remaining = []
+    for line in post_script.splitlines(keepends=True):
+        match = MODULE_LOAD.match(line)
+        if match:
+            # Module names like 'mpich/4.1-gcc-12' start with the package name
+            modules = match.group("modules").split()
+            if all(module.split("/")[0] in packages for module in modules):
+                lines.append(f"# Provided by the view: {line}")
+                continue
+            remaining.append(line.strip())
+        lines.append(line)
+    if remaining:
+        print("===> Warning: The post-script still loads modules that are not part of the view:")
+        for line in remaining:
+            print(f"  {line}")
+    return "".join(lines)
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import yaml
+
+SPACKTER = Path(__file__).resolve().parent.parent / "bin/spackter.py"
+
+# Modules only needed by the heavy commands, 'spackter load' must not import them
+HEAVY_MODULES = ["git", "requests", "rich.table", "asyncio"]
+
+# Seconds spent importing modules for 'spackter load --only-env-script', without the
+# modules that the interpreter imports on its own, best of a few runs
+IMPORT_BUDGET = 0.1
+
+
+def run_load(spackter_root: Path, *python_args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, SPACKTER_ROOT=spackter_root.as_posix())
+    cmd = [sys.executable, *python_args, SPACKTER, "load", "1", "--id", "--only-env-script"]
+    return subprocess.run(cmd, capture_output=True, text=True, env=env)
+
+
+def get_import_times(stderr: str) -> dict[str, float]:
+    # Cumulative seconds of the top level imports. Lines look like
+    # 'import time:       123 |        456 |   package.module', nested imports are indented
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def create_spackter_root(tmp_path: Path) -> Path:
+    spack_root = tmp_path / "spack/demo"
+    (tmp_path / "data").mkdir()
+    stacks = {
+        "data": {"stack_count": 1, "id_counter": 1, "spackter_version": "test"},
+        spack_root.as_posix(): {
+            "id": 1,
+            "name": "demo",
+            "type": "SPACKTER",
+            "env_script": (spack_root / "env.sh").as_posix(),
+        },
+    }
+    with open(tmp_path / "data/stacks.yaml", "w") as file:
+        file.write(yaml.safe_dump(stacks))
+    return tmp_path
+
+
+def test_load_skips_heavy_imports(tmp_path):
+    result = run_load(create_spackter_root(tmp_path), "-X", "importtime")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == (tmp_path / "spack/demo/env.sh").as_posix()
+
+    imported = {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+    assert not [module for module in HEAVY_MODULES if module in imported]
+
+
+def test_load_import_time(tmp_path):
+    spackter_root = create_spackter_root(tmp_path)
+    baseline = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True
+    )
+    interpreter_modules = get_import_times(baseline.stderr)
+    durations = []
+    for _ in range(3):
+        result = run_load(spackter_root, "-X", "importtime")
+        assert result.returncode == 0, result.stderr
+        times = get_import_times(result.stderr)
+        durations.append(
+            sum(time for name, time in times.items() if name not in interpreter_modules)
+        )
+    assert min(durations) < IMPORT_BUDGET, f"{min(durations):.3f}s"